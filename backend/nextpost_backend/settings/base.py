@@ -124,6 +124,14 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER or "no-reply@nextpost.local"
 
+# Cache (Redis) : réponses Graph API, compteurs et listes par utilisateur
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL", "redis://localhost:6379/1"),
+    }
+}
+
 # Configuration Celery
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
@@ -132,3 +140,30 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Une tâche réservée à la fois par processus, acquittée après exécution
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# Publications sur une file dédiée (I/O), servie par un worker séparé:
+#   celery -A nextpost_backend worker -Q publications -c 32 -P threads --prefetch-multiplier=1
+CELERY_TASK_ROUTES = {
+    'scheduler.tasks.publish_post': {'queue': 'publications'},
+    'scheduler.tasks.publish_post_now': {'queue': 'publications'},
+    'scheduler.tasks.sweep_due_posts': {'queue': 'publications'},
+    'scheduler.tasks.dispatch_due_posts': {'queue': 'publications'},
+}
+# Tâches périodiques synchronisées dans django_celery_beat au démarrage de beat
+CELERY_BEAT_SCHEDULE = {
+    # Même nom d'entrée: la tâche planifiée existante est mise à jour, pas dupliquée
+    'sweep-due-posts': {
+        'task': 'scheduler.tasks.dispatch_due_posts',
+        'schedule': 10.0,
+    },
+    'refresh-upcoming-media-urls': {
+        'task': 'scheduler.tasks.refresh_upcoming_media_urls',
+        'schedule': 30 * 60,
+    },
+    'test-social-accounts': {
+        'task': 'scheduler.tasks.dispatch_social_account_tests',
+        'schedule': 6 * 60 * 60,
+    },
+}
@@ -1,20 +1,66 @@
+from types import MappingProxyType
+
 from django.contrib import admin
+from django.core.cache import cache
+from django.forms.models import BaseInlineFormSet
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Post, SocialAccount, PostMediaAsset
+from media.models import MediaAsset
+from .models import Post, SocialAccount, PostMediaAsset, SocialPlatform, ValidationState
+
+PLATFORM_ICONS = MappingProxyType({
+    SocialPlatform.FACEBOOK_PAGE: '📘',
+    SocialPlatform.FACEBOOK_GROUP: '👥',
+    SocialPlatform.INSTAGRAM_FEED: '📷',
+    SocialPlatform.INSTAGRAM_STORY: '📖',
+    SocialPlatform.INSTAGRAM_REELS: '🎬',
+    SocialPlatform.TWITTER_POST: '🐦',
+    SocialPlatform.LINKEDIN_COMPANY: '💼',
+    SocialPlatform.LINKEDIN_PERSONAL: '👤',
+    SocialPlatform.TIKTOK_POST: '🎵',
+    SocialPlatform.YOUTUBE_SHORT: '📺',
+})
+
+# Icon + label rendered once per platform; both parts are trusted constants
+PLATFORM_DISPLAY = MappingProxyType({
+    value: mark_safe(f"{PLATFORM_ICONS.get(value, '📱')} {label}")
+    for value, label in SocialPlatform.choices
+})
+
+THUMBNAIL_CACHE_TTL = 60 * 60
+
+def small_thumbnail_url(asset):
+    """Small thumbnail URL, cached per asset content so previews skip storage"""
+    cache_key = f"media:thumb:small:{asset.pk}:{asset.sha256_hash or ''}"
+    url = cache.get(cache_key)
+    if url is None:
+        url = asset.get_thumbnail('small') or ''
+        cache.set(cache_key, url, THUMBNAIL_CACHE_TTL)
+    return url
+
+class PostMediaAssetFormSet(BaseInlineFormSet):
+    """Inline formset limited to the first assets to keep the change page light"""
+    max_displayed = 10
+    
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset()[:self.max_displayed]
+        return self._queryset
 
 class PostMediaAssetInline(admin.TabularInline):
     """Inline admin for post media assets"""
     model = PostMediaAsset
+    formset = PostMediaAssetFormSet
     extra = 0
+    raw_id_fields = ('asset',)
     readonly_fields = ('asset_preview', 'asset_info')
     fields = ('asset', 'asset_preview', 'asset_info', 'order', 'metadata')
     
     def asset_preview(self, obj):
         """Show thumbnail preview of media asset"""
         if obj.asset and obj.asset.is_image():
-            thumbnail = obj.asset.get_thumbnail('small')
+            thumbnail = small_thumbnail_url(obj.asset)
             if thumbnail:
                 return format_html(
                     '<img src="{}" width="50" height="50" style="object-fit: cover;" />',
@@ -38,6 +84,18 @@ class PostMediaAssetInline(admin.TabularInline):
             )
         return "No asset"
     asset_info.short_description = 'Asset Info'
+    
+    def get_queryset(self, request):
+        """Load assets alongside rows to avoid one query per preview"""
+        return super().get_queryset(request).select_related('asset')
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Keep the asset dropdown query narrow to the columns it renders"""
+        if db_field.name == 'asset':
+            kwargs['queryset'] = MediaAsset.objects.only(
+                'id', 'original_filename', 'media_type'
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
@@ -46,13 +104,17 @@ class PostAdmin(admin.ModelAdmin):
         'status', 'validation_status', 'media_count', 'scheduled_time', 'created_at'
     )
     list_filter = (
-        'status', 'is_active', 'social_account__platform', 
+        'status', 'validation_state', 'is_active', 'platform', 
         'created_at', 'scheduled_time'
     )
     search_fields = ('title', 'content', 'user__email', 'social_account__username')
+    raw_id_fields = ('user', 'social_account')
+    list_select_related = ('user', 'social_account__user')
+    list_per_page = 25
+    show_full_result_count = False
     readonly_fields = (
         'created_at', 'updated_at', 'published_at', 'platform_post_id',
-        'validation_preview', 'platform_rules_preview'
+        'validation_preview', 'platform_rules_preview', 'all_media_link'
     )
     fieldsets = (
         ('Basic Information', {
@@ -61,6 +123,9 @@ class PostAdmin(admin.ModelAdmin):
         ('Scheduling', {
             'fields': ('status', 'scheduled_time', 'published_at')
         }),
+        ('Media', {
+            'fields': ('all_media_link',)
+        }),
         ('Platform Configuration', {
             'fields': ('platform_configs', 'validation_preview', 'platform_rules_preview'),
             'classes': ('collapse',)
@@ -81,52 +146,53 @@ class PostAdmin(admin.ModelAdmin):
     )
     inlines = [PostMediaAssetInline]
     
+    changelist_fields = (
+        'id', 'title', 'platform', 'status', 'validation_state', 'media_assets_count',
+        'scheduled_time', 'created_at',
+        'user__email', 'social_account__platform', 'social_account__username',
+        'social_account__user__email',
+    )
+    
+    def get_queryset(self, request):
+        """Load only the displayed columns on the changelist"""
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if match and match.url_name and match.url_name.endswith('_changelist'):
+            queryset = queryset.select_related(*self.list_select_related).only(*self.changelist_fields)
+        return queryset
+    
+    def _cached_validate(self, obj):
+        """Run platform validation once per object and reuse the result"""
+        if not hasattr(obj, '_validation_errors'):
+            obj._validation_errors = obj.validate_for_platform()
+        return obj._validation_errors
+    
+    def _cached_rules(self, obj):
+        """Resolve platform rules once per object and reuse the result"""
+        if not hasattr(obj, '_platform_rules'):
+            obj._platform_rules = obj.get_platform_rules()
+        return obj._platform_rules
+    
     def platform_display(self, obj):
         """Display platform with icon"""
-        if obj.social_account:
-            platform_icons = {
-                'facebook_page': '📘',
-                'facebook_group': '👥',
-                'instagram_feed': '📷',
-                'instagram_story': '📖',
-                'instagram_reels': '🎬',
-                'twitter': '🐦',
-                'linkedin_page': '💼',
-                'linkedin_personal': '👤',
-                'tiktok': '🎵',
-                'youtube': '📺'
-            }
-            icon = platform_icons.get(obj.social_account.platform, '📱')
-            return format_html(
-                '{} {}',
-                icon,
-                obj.social_account.get_platform_display()
-            )
+        if obj.platform:
+            return PLATFORM_DISPLAY.get(obj.platform, obj.platform)
         return "No platform"
     platform_display.short_description = 'Platform'
     
     def validation_status(self, obj):
-        """Show validation status with color coding"""
-        try:
-            errors = obj.validate_for_platform()
-            if not errors:
-                return format_html(
-                    '<span style="color: green; font-weight: bold;">✓ Valid</span>'
-                )
-            else:
-                return format_html(
-                    '<span style="color: red; font-weight: bold;">✗ {} errors</span>',
-                    len(errors)
-                )
-        except Exception:
-            return format_html(
-                '<span style="color: orange; font-weight: bold;">? Unknown</span>'
-            )
+        """Show stored validation status with color coding"""
+        if obj.validation_state == ValidationState.VALID:
+            return mark_safe('<span style="color: green; font-weight: bold;">✓ Valid</span>')
+        if obj.validation_state == ValidationState.INVALID:
+            return mark_safe('<span style="color: red; font-weight: bold;">✗ Invalid</span>')
+        return mark_safe('<span style="color: orange; font-weight: bold;">? Unknown</span>')
     validation_status.short_description = 'Validation'
+    validation_status.admin_order_field = 'validation_state'
     
     def media_count(self, obj):
         """Show number of attached media assets"""
-        count = obj.postmediaasset_set.count()
+        count = obj.media_assets_count
         if count > 0:
             return format_html(
                 '<span style="background: #e1f5fe; padding: 2px 6px; border-radius: 3px;">{} assets</span>',
@@ -134,11 +200,24 @@ class PostAdmin(admin.ModelAdmin):
             )
         return "No media"
     media_count.short_description = 'Media'
+    media_count.admin_order_field = 'media_assets_count'
+    
+    def all_media_link(self, obj):
+        """Link to the full media list, since the inline only shows the first assets"""
+        if not obj.pk:
+            return "No media"
+        count = obj.media_assets_count
+        url = reverse('admin:scheduler_postmediaasset_changelist')
+        return format_html(
+            '<a href="{}?post__id__exact={}">See all {} media</a>',
+            url, obj.pk, count
+        )
+    all_media_link.short_description = 'All Media'
     
     def validation_preview(self, obj):
         """Show validation errors in admin"""
         try:
-            errors = obj.validate_for_platform()
+            errors = self._cached_validate(obj)
             if not errors:
                 return mark_safe('<span style="color: green;">✓ Post is valid for this platform</span>')
             else:
@@ -151,7 +230,7 @@ class PostAdmin(admin.ModelAdmin):
     def platform_rules_preview(self, obj):
         """Show platform rules in admin"""
         try:
-            rules = obj.get_platform_rules()
+            rules = self._cached_rules(obj)
             rules_html = []
             for key, value in rules.items():
                 rules_html.append(f'<strong>{key.replace("_", " ").title()}:</strong> {value}')
@@ -168,6 +247,7 @@ class SocialAccountAdmin(admin.ModelAdmin):
     )
     list_filter = ('platform', 'is_active', 'created_at', 'last_used_at')
     search_fields = ('username', 'user__email')
+    show_full_result_count = False
     readonly_fields = (
         'created_at', 'updated_at', 'posts_count', 'last_used_at',
         'platform_capabilities_preview'
@@ -190,26 +270,13 @@ class SocialAccountAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Join user to avoid one query per row"""
+        return super().get_queryset(request).select_related('user')
+    
     def platform_display(self, obj):
         """Display platform with icon"""
-        platform_icons = {
-            'facebook_page': '📘',
-            'facebook_group': '👥',
-            'instagram_feed': '📷',
-            'instagram_story': '📖',
-            'instagram_reels': '🎬',
-            'twitter': '🐦',
-            'linkedin_page': '💼',
-            'linkedin_personal': '👤',
-            'tiktok': '🎵',
-            'youtube': '📺'
-        }
-        icon = platform_icons.get(obj.platform, '📱')
-        return format_html(
-            '{} {}',
-            icon,
-            obj.get_platform_display()
-        )
+        return PLATFORM_DISPLAY.get(obj.platform, obj.platform)
     platform_display.short_description = 'Platform'
     
     def last_used_display(self, obj):
@@ -241,12 +308,18 @@ class PostMediaAssetAdmin(admin.ModelAdmin):
     list_display = ('id', 'post', 'asset_preview', 'asset_name', 'order', 'created_at')
     list_filter = ('asset__media_type', 'created_at')
     search_fields = ('post__title', 'post__content', 'asset__original_filename')
+    raw_id_fields = ('post', 'asset')
+    show_full_result_count = False
     readonly_fields = ('created_at', 'asset_preview', 'asset_details')
     
+    def get_queryset(self, request):
+        """Join post and asset to avoid N+1 queries on the changelist"""
+        return super().get_queryset(request).select_related('post__user', 'asset')
+    
     def asset_preview(self, obj):
         """Show asset preview"""
         if obj.asset and obj.asset.is_image():
-            thumbnail = obj.asset.get_thumbnail('small')
+            thumbnail = small_thumbnail_url(obj.asset)
             if thumbnail:
                 return format_html(
                     '<img src="{}" width="100" height="100" style="object-fit: cover;" />',
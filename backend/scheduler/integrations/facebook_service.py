@@ -2,15 +2,58 @@
 Service d'intégration Facebook/Instagram via Graph API
 Gère l'authentification, la publication et la gestion d'erreurs
 """
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlencode
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# (connexion, lecture) en secondes pour ne jamais bloquer un worker indéfiniment
+REQUEST_TIMEOUT = (3.05, 10)
+
+def build_http_session(pool_connections: int = 10, pool_maxsize: int = 50) -> requests.Session:
+    """Session HTTP: keep-alive, pool de connexions et retries idempotents"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+        ),
+    )
+    session.mount('https://', adapter)
+    return session
+
+# Session par défaut des services instanciés sans session dédiée
+_SESSION = build_http_session()
+
+# Durées de cache des réponses Graph API réutilisables
+USER_PAGES_CACHE_TTL = 60 * 60
+LONG_LIVED_TOKEN_CACHE_TTL = 10 * 60
+
+# Code d'erreur Graph API pour un token invalide ou expiré
+INVALID_TOKEN_ERROR_CODE = '190'
+
+# Types de publication Instagram pris en charge par publish_post
+_INSTAGRAM_POST_TYPES = frozenset({'instagram_feed', 'instagram_story'})
+
+def _token_cache_key(prefix: str, token: str) -> str:
+    """Clé de cache dérivée d'un token sans jamais stocker le token en clair"""
+    return f"fb:{prefix}:{hashlib.sha256(token.encode()).hexdigest()}"
+
 class FacebookGraphAPIError(Exception):
     """Exception spécifique aux erreurs de l'API Facebook Graph"""
     def __init__(self, message: str, error_code: str = None, error_subcode: str = None):
@@ -22,8 +65,11 @@ class FacebookService:
     """Service principal pour l'intégration Facebook/Instagram"""
     
     BASE_URL = "https://graph.facebook.com/v18.0"
+    INSTAGRAM_CAROUSEL_MAX_ITEMS = 10
+    BATCH_MAX_REQUESTS = 50
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or _SESSION
         self.app_id = getattr(settings, 'FACEBOOK_APP_ID', '')
         self.app_secret = getattr(settings, 'FACEBOOK_APP_SECRET', '')
         
@@ -47,8 +93,7 @@ class FacebookService:
         if state:
             params['state'] = state
             
-        query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-        return f"https://www.facebook.com/v18.0/dialog/oauth?{query_string}"
+        return f"https://www.facebook.com/v18.0/dialog/oauth?{urlencode(params)}"
     
     def exchange_code_for_token(self, code: str, redirect_uri: str) -> Dict[str, Any]:
         """Échange le code d'autorisation contre un access_token"""
@@ -61,7 +106,7 @@ class FacebookService:
             'code': code,
         }
         
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
         data = self._handle_response(response)
         
         # Étendre la durée du token (60 jours)
@@ -84,8 +129,15 @@ class FacebookService:
             'fb_exchange_token': short_token,
         }
         
-        response = requests.get(url, params=params)
-        return self._handle_response(response)
+        cache_key = _token_cache_key('llt', short_token)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        data = self._handle_response(response)
+        cache.set(cache_key, data, LONG_LIVED_TOKEN_CACHE_TTL)
+        return data
     
     def get_user_pages(self, access_token: str) -> List[Dict[str, Any]]:
         """Récupère la liste des pages Facebook que l'utilisateur peut gérer"""
@@ -93,11 +145,17 @@ class FacebookService:
         
         params = {
             'access_token': access_token,
-            'fields': 'id,name,access_token,category,tasks,instagram_business_account'
+            # Le compte Instagram lié est développé dans la même requête
+            'fields': 'id,name,access_token,category,tasks,instagram_business_account{id,username}'
         }
         
-        response = requests.get(url, params=params)
-        data = self._handle_response(response)
+        cache_key = _token_cache_key('pages', access_token)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        data = self._handle_response(response, access_token=access_token)
         
         pages = []
         for page_data in data.get('data', []):
@@ -116,31 +174,125 @@ class FacebookService:
                     ig_account = page_data['instagram_business_account']
                     page_info['instagram_account'] = {
                         'id': ig_account['id'],
+                        'username': ig_account.get('username', ''),
                         'platform': 'instagram_feed'
                     }
                 
                 pages.append(page_info)
         
+        cache.set(cache_key, pages, USER_PAGES_CACHE_TTL)
         return pages
     
+    def get_instagram_business_accounts(self, access_token: str) -> List[Dict[str, Any]]:
+        """Récupère les comptes Instagram Business liés aux pages, sans appel supplémentaire"""
+        return self.instagram_accounts_from_pages(self.get_user_pages(access_token))
+    
+    @staticmethod
+    def instagram_accounts_from_pages(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Extrait les comptes Instagram Business des pages déjà récupérées"""
+        instagram_accounts = []
+        for page in pages:
+            if 'instagram_account' in page:
+                ig_account = page['instagram_account']
+                instagram_accounts.append({
+                    'id': ig_account['id'],
+                    'username': ig_account.get('username', ''),
+                    'name': page['name'],  # Nom de la page Facebook liée
+                    'access_token': page['access_token'],
+                    'account_type': 'BUSINESS',
+                    'platform': 'instagram_feed',
+                    'linked_facebook_page': page['id']
+                })
+        return instagram_accounts
+    
     def publish_post(self, access_token: str, platform: str, platform_user_id: str, 
                     content: str, media_urls: List[str] = None) -> Dict[str, Any]:
         """Publie un post sur Facebook ou Instagram"""
         try:
             if platform == 'facebook_page':
                 return self._publish_facebook_post(access_token, platform_user_id, content, media_urls)
-            elif platform in ['instagram_feed', 'instagram_story']:
+            elif platform in _INSTAGRAM_POST_TYPES:
                 return self._publish_instagram_post(access_token, platform_user_id, content, media_urls, platform)
             else:
                 raise FacebookGraphAPIError(f"Plateforme non supportée: {platform}")
                 
         except requests.RequestException as e:
-            logger.error(f"Erreur réseau lors de la publication: {str(e)}")
+            logger.error("Erreur réseau lors de la publication: %s", e)
             raise FacebookGraphAPIError(f"Erreur réseau: {str(e)}")
         except Exception as e:
-            logger.error(f"Erreur inattendue lors de la publication: {str(e)}")
+            logger.error("Erreur inattendue lors de la publication: %s", e)
             raise FacebookGraphAPIError(f"Erreur inattendue: {str(e)}")
     
+    def publish_facebook_posts_batch(self, access_token: str, page_id: str,
+                                     items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Publie plusieurs posts d'une même page via l'endpoint batch de Graph API
+        Chaque item contient 'content' et 'media_urls'; un résultat par item, dans l'ordre
+        
+        Les items partent par requêtes de BATCH_MAX_REQUESTS: l'échec d'une requête
+        n'affecte que ses propres items, les résultats des requêtes précédentes
+        (posts déjà publiés) sont conservés
+        """
+        results = []
+        for start in range(0, len(items), self.BATCH_MAX_REQUESTS):
+            chunk = items[start:start + self.BATCH_MAX_REQUESTS]
+            batch = []
+            for item in chunk:
+                body = {'message': item['content']}
+                if item.get('media_urls'):
+                    body['link'] = item['media_urls'][0]
+                batch.append({
+                    'method': 'POST',
+                    'relative_url': f"{page_id}/feed",
+                    'body': urlencode(body),
+                })
+            
+            data = {
+                'access_token': access_token,
+                'batch': orjson.dumps(batch).decode(),
+            }
+            try:
+                response = self.session.post(f"{self.BASE_URL}/", data=data, timeout=REQUEST_TIMEOUT)
+                sub_responses = self._handle_response(response, access_token=access_token)
+            except (requests.RequestException, FacebookGraphAPIError) as e:
+                logger.error("Échec de la requête batch Facebook (%d posts): %s", len(chunk), e)
+                error = {'success': False, 'error': str(e), 'error_code': getattr(e, 'error_code', None)}
+                results.extend(dict(error) for _ in chunk)
+                continue
+            
+            # Une sous-réponse manquante (réponse tronquée) vaut un échec explicite
+            sub_responses = list(sub_responses or [])[:len(chunk)]
+            sub_responses.extend([None] * (len(chunk) - len(sub_responses)))
+            results.extend(self._parse_batch_publish_response(sub) for sub in sub_responses)
+        
+        return results
+    
+    def _parse_batch_publish_response(self, sub_response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Convertit une sous-réponse batch en résultat de publication"""
+        # Graph API renvoie null pour une sous-requête non exécutée (timeout)
+        if not sub_response:
+            return {'success': False, 'error': 'Sous-requête batch sans réponse', 'error_code': ''}
+        
+        try:
+            body = orjson.loads(sub_response.get('body') or '{}')
+        except orjson.JSONDecodeError:
+            body = {}
+        
+        if sub_response.get('code') != 200 or 'id' not in body:
+            error = body.get('error', {})
+            return {
+                'success': False,
+                'error': error.get('message', 'Erreur inconnue'),
+                'error_code': str(error.get('code', ''))
+            }
+        
+        return {
+            'success': True,
+            'platform_post_id': body['id'],
+            'published_url': f"https://facebook.com/{body['id']}",
+            'raw_response': body
+        }
+    
     def _publish_facebook_post(self, access_token: str, page_id: str, 
                               content: str, media_urls: List[str] = None) -> Dict[str, Any]:
         """Publie un post sur une page Facebook"""
@@ -156,7 +308,7 @@ class FacebookService:
             # Pour Facebook, on peut attacher une seule image directement
             data['link'] = media_urls[0]  # ou 'picture' pour une image
         
-        response = requests.post(url, data=data)
+        response = self.session.post(url, data=data, timeout=REQUEST_TIMEOUT)
         result = self._handle_response(response)
         
         return {
@@ -173,10 +325,16 @@ class FacebookService:
         if not media_urls:
             raise FacebookGraphAPIError("Instagram nécessite au moins une image")
         
-        # Étape 1: Créer le container de média
-        container_id = self._create_instagram_media_container(
-            access_token, ig_account_id, content, media_urls[0], post_type
-        )
+        # Étape 1: Créer le container de média (carrousel si plusieurs images)
+        if len(media_urls) > 1 and post_type == 'instagram_feed':
+            container_id = self._create_instagram_carousel_container(
+                access_token, ig_account_id, content,
+                media_urls[:self.INSTAGRAM_CAROUSEL_MAX_ITEMS]
+            )
+        else:
+            container_id = self._create_instagram_media_container(
+                access_token, ig_account_id, content, media_urls[0], post_type
+            )
         
         # Étape 2: Publier le container
         return self._publish_instagram_media_container(access_token, ig_account_id, container_id)
@@ -196,7 +354,35 @@ class FacebookService:
         if post_type == 'instagram_story':
             data['media_type'] = 'STORIES'
         
-        response = requests.post(url, data=data)
+        response = self.session.post(url, data=data, timeout=REQUEST_TIMEOUT)
+        result = self._handle_response(response)
+        
+        return result['id']
+    
+    def _create_instagram_carousel_container(self, access_token: str, ig_account_id: str,
+                                           caption: str, image_urls: List[str]) -> str:
+        """Crée un container carrousel Instagram (N enfants en parallèle + 1 parent)"""
+        url = f"{self.BASE_URL}/{ig_account_id}/media"
+        
+        def _create_child(image_url: str) -> str:
+            data = {
+                'image_url': image_url,
+                'is_carousel_item': 'true',
+                'access_token': access_token,
+            }
+            response = self.session.post(url, data=data, timeout=REQUEST_TIMEOUT)
+            return self._handle_response(response)['id']
+        
+        with ThreadPoolExecutor(max_workers=len(image_urls)) as executor:
+            children = list(executor.map(_create_child, image_urls))
+        
+        data = {
+            'media_type': 'CAROUSEL',
+            'children': ','.join(children),
+            'caption': caption,
+            'access_token': access_token,
+        }
+        response = self.session.post(url, data=data, timeout=REQUEST_TIMEOUT)
         result = self._handle_response(response)
         
         return result['id']
@@ -211,7 +397,7 @@ class FacebookService:
             'access_token': access_token,
         }
         
-        response = requests.post(url, data=data)
+        response = self.session.post(url, data=data, timeout=REQUEST_TIMEOUT)
         result = self._handle_response(response)
         
         return {
@@ -230,14 +416,18 @@ class FacebookService:
             'fields': 'id,name,email'
         }
         
-        response = requests.get(url, params=params)
-        return self._handle_response(response)
+        response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        return self._handle_response(response, access_token=access_token)
     
-    def _handle_response(self, response: requests.Response) -> Dict[str, Any]:
-        """Gère les réponses de l'API Facebook et lève des exceptions appropriées"""
+    def _handle_response(self, response: requests.Response,
+                         access_token: str = None) -> Dict[str, Any]:
+        """
+        Gère les réponses de l'API Facebook et lève des exceptions appropriées
+        Un token rejeté invalide les pages mises en cache pour ce token
+        """
         try:
-            data = response.json()
-        except ValueError:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
             raise FacebookGraphAPIError(f"Réponse invalide de l'API: {response.text}")
         
         if response.status_code != 200:
@@ -246,7 +436,10 @@ class FacebookService:
             error_code = str(error.get('code', ''))
             error_subcode = str(error.get('error_subcode', ''))
             
-            logger.error(f"Erreur API Facebook: {error_code} - {error_message}")
+            logger.error("Erreur API Facebook: %s - %s", error_code, error_message)
+            
+            if access_token and (response.status_code == 401 or error_code == INVALID_TOKEN_ERROR_CODE):
+                cache.delete(_token_cache_key('pages', access_token))
             
             raise FacebookGraphAPIError(
                 message=error_message,
@@ -260,26 +453,12 @@ class FacebookService:
 class InstagramService:
     """Service spécialisé pour Instagram (utilise Facebook Graph API)"""
     
-    def __init__(self):
-        self.facebook_service = FacebookService()
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.facebook_service = FacebookService(session=session)
     
     def get_business_accounts(self, access_token: str) -> List[Dict[str, Any]]:
         """Récupère les comptes Instagram Business liés aux pages Facebook"""
-        pages = self.facebook_service.get_user_pages(access_token)
-        
-        instagram_accounts = []
-        for page in pages:
-            if 'instagram_account' in page:
-                ig_account = page['instagram_account']
-                instagram_accounts.append({
-                    'id': ig_account['id'],
-                    'name': page['name'],  # Nom de la page Facebook liée
-                    'access_token': page['access_token'],
-                    'platform': 'instagram_feed',
-                    'linked_facebook_page': page['id']
-                })
-        
-        return instagram_accounts
+        return self.facebook_service.get_instagram_business_accounts(access_token)
     
     def publish_feed_post(self, access_token: str, account_id: str, 
                          content: str, image_url: str) -> Dict[str, Any]:
@@ -3,15 +3,35 @@ Service de publication unifié pour toutes les plateformes
 Gère la validation, la publication et le suivi des erreurs
 """
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
 from datetime import datetime
+
+import requests
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
 from django.utils import timezone
 
 from ..models import Post, SocialAccount
-from .facebook_service import FacebookService, InstagramService, FacebookGraphAPIError
+from .facebook_service import (
+    FacebookService, InstagramService, FacebookGraphAPIError, build_http_session
+)
 
 logger = logging.getLogger(__name__)
 
+# Durée de vie d'une validation de token réussie
+TOKEN_VALIDATION_CACHE_TTL = 300
+
+# Groupes de plateformes, construits une fois (test d'appartenance O(1))
+_INSTAGRAM_IMAGE_PLATFORMS = frozenset({'instagram_feed', 'instagram_story'})
+_GRAPH_API_PLATFORMS = frozenset({'facebook_page', 'instagram_feed', 'instagram_story'})
+
+# Résultat d'un post resté sans sous-réponse dans une requête batch Facebook
+_MISSING_BATCH_RESULT = {'success': False, 'error': 'Aucune réponse batch pour ce post', 'error_code': ''}
+
 class PublicationError(Exception):
     """Exception générique pour les erreurs de publication"""
     def __init__(self, message: str, platform: str = None, error_code: str = None):
@@ -19,45 +39,100 @@ class PublicationError(Exception):
         self.platform = platform
         self.error_code = error_code
 
+# Fonctions de publication spécialisées par plateforme, enregistrées à l'import
+_PLATFORM_PUBLISHERS: Dict[str, Callable[['UniversalPublisher', Post, List[str]], Dict[str, Any]]] = {}
+
+def register_platform_publisher(platform: str):
+    """
+    Décorateur: enregistre la fonction de publication d'une plateforme
+    Un nouvel adaptateur s'ajoute sans toucher à UniversalPublisher
+    """
+    def decorator(func):
+        _PLATFORM_PUBLISHERS[platform] = func
+        return func
+    return decorator
+
+@register_platform_publisher('facebook_page')
+def _pub_fb(publisher: 'UniversalPublisher', post: Post, media_urls: List[str]) -> Dict[str, Any]:
+    """Publie sur Facebook Page"""
+    return publisher.facebook_service.publish_post(
+        access_token=post.social_account.access_token,
+        platform='facebook_page',
+        platform_user_id=post.social_account.platform_user_id,
+        content=post.content,
+        media_urls=media_urls
+    )
+
+@register_platform_publisher('instagram_feed')
+def _pub_ig_feed(publisher: 'UniversalPublisher', post: Post, media_urls: List[str]) -> Dict[str, Any]:
+    """Publie sur Instagram Feed"""
+    if not media_urls:
+        raise PublicationError("Instagram Feed nécessite au moins une image")
+    
+    # Passer toutes les images pour permettre la publication en carrousel
+    return publisher.facebook_service.publish_post(
+        access_token=post.social_account.access_token,
+        platform='instagram_feed',
+        platform_user_id=post.social_account.platform_user_id,
+        content=post.content,
+        media_urls=media_urls
+    )
+
+@register_platform_publisher('instagram_story')
+def _pub_ig_story(publisher: 'UniversalPublisher', post: Post, media_urls: List[str]) -> Dict[str, Any]:
+    """Publie sur Instagram Story"""
+    if not media_urls:
+        raise PublicationError("Instagram Story nécessite une image")
+    
+    return publisher.instagram_service.publish_story(
+        access_token=post.social_account.access_token,
+        account_id=post.social_account.platform_user_id,
+        content=post.content,
+        image_url=media_urls[0]
+    )
+
 class UniversalPublisher:
     """Service de publication unifié pour toutes les plateformes"""
     
+    # Mapping des plateformes vers leurs fonctions de publication (register_platform_publisher)
+    _DISPATCH = _PLATFORM_PUBLISHERS
+    
+    # Publications simultanées maximum par compte social dans _execute_concurrently
+    PER_ACCOUNT_CONCURRENCY = 2
+    # Requêtes batch Facebook envoyées simultanément par publish_posts_bulk
+    BATCH_CONCURRENCY = 8
+    
     def __init__(self):
-        self.facebook_service = FacebookService()
-        self.instagram_service = InstagramService()
-        
-        # Mapping des plateformes vers leurs services
-        self.platform_services = {
-            'facebook_page': self._publish_facebook,
-            'instagram_feed': self._publish_instagram_feed,
-            'instagram_story': self._publish_instagram_story,
-        }
+        # Une session keep-alive partagée par tous les services du publisher
+        # Dimensionnée pour un worker threads (-c 32) et les pools de publication internes
+        self.http = build_http_session(pool_connections=50, pool_maxsize=100)
+        self.facebook_service = FacebookService(session=self.http)
+        self.instagram_service = InstagramService(session=self.http)
     
     def validate_post_for_publication(self, post: Post) -> List[str]:
         """
         Valide qu'un post peut être publié sur sa plateforme cible
         Retourne une liste d'erreurs (vide si valide)
         """
-        errors = []
+        account = post.social_account
+        if not account:
+            return ["Aucun compte social associé"]
         
-        if not post.social_account:
-            errors.append("Aucun compte social associé")
-            return errors
-        
-        if not post.social_account.is_active:
+        # Compte inutilisable: rien ne sera publié, inutile d'aller plus loin
+        errors = []
+        if not account.is_active:
             errors.append("Le compte social n'est pas actif")
-        
-        if not post.social_account.access_token:
+        if not account.access_token:
             errors.append("Token d'accès manquant pour le compte social")
+        if errors:
+            return errors
         
         # Validation spécifique à la plateforme
-        platform_errors = post.validate_for_platform()
-        errors.extend(platform_errors)
+        errors.extend(post.validate_for_platform())
         
-        # Validation des médias pour Instagram
-        if post.social_account.platform in ['instagram_feed', 'instagram_story']:
-            media_assets = post.media_assets.filter(file_type='image')
-            if not media_assets.exists() and not post.image:
+        # Validation des médias pour Instagram: le champ legacy avant la base
+        if post.target_platform in _INSTAGRAM_IMAGE_PLATFORMS and not post.image:
+            if not post.has_media_asset('image'):
                 errors.append("Instagram nécessite au moins une image")
         
         return errors
@@ -73,6 +148,7 @@ class UniversalPublisher:
         Returns:
             Dict avec le résultat de la publication
         """
+        platform = None
         try:
             # Validation préliminaire
             if not force and post.status != Post.PostStatus.SCHEDULED:
@@ -82,140 +158,296 @@ class UniversalPublisher:
             if validation_errors:
                 raise PublicationError(f"Erreurs de validation: {', '.join(validation_errors)}")
             
-            # Marquer le post comme en cours de publication
-            post.status = Post.PostStatus.PUBLISHING
-            post.save(update_fields=['status', 'updated_at'])
-            
-            platform = post.social_account.platform
-            
-            # Vérifier que la plateforme est supportée
-            if platform not in self.platform_services:
-                raise PublicationError(f"Plateforme non supportée: {platform}", platform=platform)
-            
-            # Préparer les médias
-            media_urls = self._prepare_media_urls(post)
-            
-            # Publier via le service approprié
-            logger.info(f"Publication du post {post.id} sur {platform}")
-            
-            publish_func = self.platform_services[platform]
-            result = publish_func(post, media_urls)
-            
-            # Mise à jour du post avec le résultat
-            post.status = Post.PostStatus.PUBLISHED
-            post.published_at = timezone.now()
-            post.platform_post_id = result.get('platform_post_id')
-            post.error_message = None
-            post.save(update_fields=[
-                'status', 'published_at', 'platform_post_id', 
-                'error_message', 'updated_at'
-            ])
-            
-            # Mise à jour des statistiques du compte social
-            post.social_account.posts_count += 1
-            post.social_account.last_used_at = timezone.now()
-            post.social_account.save(update_fields=['posts_count', 'last_used_at'])
-            
-            logger.info(f"Post {post.id} publié avec succès sur {platform}")
-            
-            return {
-                'success': True,
-                'platform_post_id': result.get('platform_post_id'),
-                'published_url': result.get('published_url'),
-                'published_at': post.published_at.isoformat(),
-                'message': f'Post publié avec succès sur {post.social_account.get_platform_display()}'
-            }
+            platform = post.target_platform
+            result = self._execute_publication(post)
             
         except PublicationError:
             # Re-raise les erreurs de publication
             raise
         except FacebookGraphAPIError as e:
             error_msg = f"Erreur Facebook API: {e}"
-            logger.error(f"Erreur Facebook pour le post {post.id}: {error_msg}")
+            logger.error("Erreur Facebook pour le post %s: %s", post.id, error_msg)
             self._mark_post_failed(post, error_msg)
             raise PublicationError(error_msg, platform=platform, error_code=e.error_code)
         except Exception as e:
             error_msg = f"Erreur inattendue: {str(e)}"
-            logger.error(f"Erreur inattendue pour le post {post.id}: {error_msg}")
+            logger.error("Erreur inattendue pour le post %s: %s", post.id, error_msg, exc_info=True)
             self._mark_post_failed(post, error_msg)
             raise PublicationError(error_msg, platform=platform)
+        
+        now = timezone.now()
+        response = self._stage_result(post, result, now)
+        self._flush_staged([post], [], now)
+        
+        logger.info("Post %s publié avec succès sur %s", post.id, platform)
+        response['message'] = f'Post publié avec succès sur {post.social_account.get_platform_display()}'
+        return response
     
-    def _publish_facebook(self, post: Post, media_urls: List[str]) -> Dict[str, Any]:
-        """Publie sur Facebook Page"""
-        return self.facebook_service.publish_post(
-            access_token=post.social_account.access_token,
-            platform='facebook_page',
-            platform_user_id=post.social_account.platform_user_id,
-            content=post.content,
-            media_urls=media_urls
-        )
+    def _execute_publication(self, post: Post) -> Dict[str, Any]:
+        """
+        Envoie le post à l'API de sa plateforme, sans aucune écriture en base
+        Lève PublicationError / FacebookGraphAPIError en cas d'échec
+        """
+        platform = post.target_platform
+        
+        # Vérifier que la plateforme est supportée
+        if platform not in self._DISPATCH:
+            raise PublicationError(f"Plateforme non supportée: {platform}", platform=platform)
+        
+        media_urls = self._prepare_media_urls(post)
+        
+        logger.debug("Publication du post %s sur %s", post.id, platform)
+        return self._DISPATCH[platform](self, post, media_urls)
     
-    def _publish_instagram_feed(self, post: Post, media_urls: List[str]) -> Dict[str, Any]:
-        """Publie sur Instagram Feed"""
-        if not media_urls:
-            raise PublicationError("Instagram Feed nécessite au moins une image")
-            
-        return self.instagram_service.publish_feed_post(
-            access_token=post.social_account.access_token,
-            account_id=post.social_account.platform_user_id,
-            content=post.content,
-            image_url=media_urls[0]
-        )
+    def _stage_result(self, post: Post, result: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        """Applique un résultat de publication réussi sur l'instance (en mémoire uniquement)"""
+        post.status = Post.PostStatus.PUBLISHED
+        post.published_at = now
+        post.platform_post_id = result.get('platform_post_id')
+        post.error_message = None
+        post.updated_at = now
+        return {
+            'success': True,
+            'platform_post_id': result.get('platform_post_id'),
+            'published_url': result.get('published_url'),
+            'published_at': now.isoformat(),
+        }
     
-    def _publish_instagram_story(self, post: Post, media_urls: List[str]) -> Dict[str, Any]:
-        """Publie sur Instagram Story"""
-        if not media_urls:
-            raise PublicationError("Instagram Story nécessite une image")
+    def _stage_failure(self, post: Post, error_message: str, now: datetime,
+                       error_code: str = None) -> Dict[str, Any]:
+        """Applique un échec de publication sur l'instance (en mémoire uniquement)"""
+        post.status = Post.PostStatus.FAILED
+        post.error_message = error_message[:1000]
+        post.updated_at = now
+        return {'success': False, 'error': error_message, 'error_code': error_code}
+    
+    def _flush_staged(self, published: List[Post], failed: List[Post], now: datetime):
+        """
+        Écrit en base les posts préparés par _stage_result / _stage_failure
+        Un UPDATE groupé par ensemble de champs et un UPDATE par compte social
+        """
+        with transaction.atomic():
+            if len(published) == 1:
+                # Publication unitaire: un UPDATE simple plutôt qu'un CASE WHEN
+                post = published[0]
+                Post.objects.filter(pk=post.pk).update(
+                    status=post.status,
+                    published_at=post.published_at,
+                    platform_post_id=post.platform_post_id,
+                    error_message=None,
+                    updated_at=now
+                )
+            elif published:
+                Post.objects.bulk_update(published, [
+                    'status', 'published_at', 'platform_post_id',
+                    'error_message', 'updated_at'
+                ])
+            if published:
+                # Compteurs des comptes sociaux, que le lot compte un ou plusieurs posts
+                usage = Counter(post.social_account_id for post in published)
+                for account_id, count in usage.items():
+                    SocialAccount.objects.filter(pk=account_id).update(
+                        posts_count=F('posts_count') + count,
+                        last_used_at=now
+                    )
+                # UPDATE direct: les listes de comptes en cache sont invalidées ici
+                cache.delete_many({
+                    SocialAccount.accounts_list_cache_key(post.user_id) for post in published
+                })
+            if failed:
+                Post.objects.bulk_update(failed, ['status', 'error_message', 'updated_at'])
+        # bulk_update/update n'envoient aucun signal: statistiques invalidées ici
+        if published or failed:
+            cache.delete_many({Post.stats_cache_key(post.user_id) for post in published + failed})
+    
+    def publish_posts_bulk(self, posts: List[Post]) -> Dict[int, Dict[str, Any]]:
+        """
+        Publie un lot de posts en regroupant les pages Facebook par compte social
+        
+        Les posts Facebook d'un même compte partent en une seule requête batch
+        Graph API; les autres plateformes (Instagram: plusieurs appels successifs
+        par post) sont publiées en parallèle, pendant que les requêtes batch des
+        différents comptes sont envoyées simultanément. Toutes les écritures sont
+        regroupées en fin de lot.
+        
+        Returns:
+            Dict {post_id: résultat de la publication}
+        """
+        results = {}
+        published, failed = [], []
+        facebook_groups = defaultdict(list)
+        individual_posts = []
+        now = timezone.now()
+        
+        for post in posts:
+            validation_errors = self.validate_post_for_publication(post)
+            if validation_errors:
+                error_msg = f"Erreurs de validation: {', '.join(validation_errors)}"
+                results[post.id] = self._stage_failure(post, error_msg, now)
+                failed.append(post)
+            elif post.target_platform == 'facebook_page':
+                facebook_groups[post.social_account_id].append(post)
+            else:
+                individual_posts.append(post)
+        
+        # Requêtes batch Facebook préparées ici (médias éventuellement lus en base),
+        # puis envoyées en parallèle des publications individuelles
+        batch_jobs = [
+            (group, [
+                {'content': post.content, 'media_urls': self._prepare_media_urls(post)}
+                for post in group
+            ])
+            for group in facebook_groups.values()
+        ]
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.BATCH_CONCURRENCY, len(batch_jobs)))) as executor:
+            batch_futures = [
+                (group, executor.submit(self._send_facebook_batch, group[0].social_account, items))
+                for group, items in batch_jobs
+            ]
+            
+            for post, result, error in self._execute_concurrently(individual_posts):
+                if error is None:
+                    results[post.id] = self._stage_result(post, result, now)
+                    published.append(post)
+                elif isinstance(error, FacebookGraphAPIError):
+                    error_msg = f"Erreur Facebook API: {error}"
+                    results[post.id] = self._stage_failure(post, error_msg, now, error.error_code)
+                    failed.append(post)
+                elif isinstance(error, PublicationError):
+                    results[post.id] = self._stage_failure(post, str(error), now, error.error_code)
+                    failed.append(post)
+                else:
+                    results[post.id] = self._stage_failure(post, f"Erreur inattendue: {str(error)}", now)
+                    failed.append(post)
             
-        return self.instagram_service.publish_story(
-            access_token=post.social_account.access_token,
-            account_id=post.social_account.platform_user_id,
-            content=post.content,
-            image_url=media_urls[0]
+            for group, future in batch_futures:
+                outcomes = future.result()
+                # Aucun post sans résultat: un résultat manquant est un échec explicite
+                outcomes = outcomes + [_MISSING_BATCH_RESULT] * (len(group) - len(outcomes))
+                for post, outcome in zip(group, outcomes):
+                    if outcome['success']:
+                        results[post.id] = self._stage_result(post, outcome, now)
+                        published.append(post)
+                    else:
+                        error_msg = f"Erreur Facebook API: {outcome['error']}"
+                        results[post.id] = self._stage_failure(post, error_msg, now, outcome.get('error_code'))
+                        failed.append(post)
+        
+        self._flush_staged(published, failed, now)
+        
+        # Une seule ligne de journal par lot, au lieu d'une par post
+        logger.info(
+            "Lot publié: %d/%d posts, plateformes=%s",
+            len(published), len(posts), dict(Counter(post.target_platform for post in published))
         )
+        return results
+    
+    def _send_facebook_batch(self, account: SocialAccount, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envoie la requête batch Graph API d'un compte, sans accès à la base
+        Les erreurs sont traitées par requête dans publish_facebook_posts_batch;
+        une erreur résiduelle devient un échec pour chaque post du lot
+        """
+        try:
+            return self.facebook_service.publish_facebook_posts_batch(
+                account.access_token, account.platform_user_id, items
+            )
+        except (requests.RequestException, FacebookGraphAPIError) as e:
+            error = {'success': False, 'error': str(e), 'error_code': getattr(e, 'error_code', None)}
+            return [error] * len(items)
+    
+    def _execute_concurrently(self, posts: List[Post], max_workers: int = 16) -> List[tuple]:
+        """
+        Envoie plusieurs posts à leur plateforme en parallèle (threads)
+        Aucune écriture en base: renvoie (post, résultat, exception) pour chaque post
+        Le nombre d'appels simultanés par compte social est borné pour respecter
+        les limites de débit de Graph API
+        """
+        if not posts:
+            return []
+        
+        # Un sémaphore par compte, créé avant le lancement des threads
+        semaphores = {
+            account_id: threading.BoundedSemaphore(self.PER_ACCOUNT_CONCURRENCY)
+            for account_id in {post.social_account_id for post in posts}
+        }
+        
+        def execute(post: Post) -> tuple:
+            try:
+                with semaphores[post.social_account_id]:
+                    return post, self._execute_publication(post), None
+            except Exception as e:
+                return post, None, e
+            finally:
+                # Chaque thread ouvre sa propre connexion à la base
+                connection.close()
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(posts))) as executor:
+            return list(executor.map(execute, posts))
     
     def _prepare_media_urls(self, post: Post) -> List[str]:
         """Prépare les URLs des médias pour la publication"""
-        media_urls = []
-        
+        # URLs précalculées à l'ajout des médias: aucun appel au stockage
+        if post.cached_media_urls:
+            return list(post.cached_media_urls)
+        return self._legacy_media_urls(post)
+    
+    def _legacy_media_urls(self, post: Post) -> List[str]:
+        """Calcule les URLs depuis les fichiers (posts sans URLs précalculées)"""
         # URLs des MediaAssets liés
-        for post_asset in post.postmediaasset_set.filter(
-            asset__file_type='image'
-        ).order_by('order'):
-            if post_asset.asset.file:
-                # Construire l'URL absolue
-                # En production, cela devrait pointer vers votre CDN/stockage
-                media_urls.append(post_asset.asset.file.url)
+        # En production, le stockage par défaut devrait pointer vers votre CDN
+        media_urls = post.compute_media_urls()
         
         # Fallback sur les champs image/video legacy
         if not media_urls:
             if post.image:
                 media_urls.append(post.image.url)
-            elif post.video and post.social_account.platform == 'facebook_page':
+            elif post.video and post.target_platform == 'facebook_page':
                 media_urls.append(post.video.url)
         
         return media_urls
     
     def _mark_post_failed(self, post: Post, error_message: str):
-        """Marque un post comme échoué avec le message d'erreur"""
+        """
+        Marque un post comme échoué avec le message d'erreur
+        Un seul UPDATE, sans passer par save() ni ses effets de bord (replanification)
+        """
+        now = timezone.now()
+        error_message = error_message[:1000]  # Limiter la taille
+        Post.objects.filter(pk=post.pk).update(
+            status=Post.PostStatus.FAILED,
+            error_message=error_message,
+            updated_at=now
+        )
         post.status = Post.PostStatus.FAILED
-        post.error_message = error_message[:1000]  # Limiter la taille
-        post.save(update_fields=['status', 'error_message', 'updated_at'])
+        post.error_message = error_message
+        post.updated_at = now
+        cache.delete(Post.stats_cache_key(post.user_id))
     
     def test_social_account_connection(self, social_account: SocialAccount) -> Dict[str, Any]:
         """
         Teste la connexion d'un compte social
         Utile pour vérifier que les tokens sont valides
+        Les validations réussies sont mises en cache quelques minutes
         """
+        cache_key = None
+        if social_account.access_token:
+            cache_key = SocialAccount.token_validation_cache_key(social_account.access_token)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = self._check_social_account_connection(social_account)
+        if result['success'] and cache_key:
+            cache.set(cache_key, result, timeout=TOKEN_VALIDATION_CACHE_TTL)
+        return result
+    
+    def _check_social_account_connection(self, social_account: SocialAccount) -> Dict[str, Any]:
+        """Valide le token du compte auprès de l'API de sa plateforme"""
         try:
-            if social_account.platform == 'facebook_page':
-                result = self.facebook_service.validate_token(social_account.access_token)
-                return {
-                    'success': True,
-                    'platform': 'facebook_page',
-                    'user_info': result
-                }
-            elif social_account.platform in ['instagram_feed', 'instagram_story']:
+            # Facebook et Instagram partagent la validation de token Graph API
+            if social_account.platform in _GRAPH_API_PLATFORMS:
                 result = self.facebook_service.validate_token(social_account.access_token)
                 return {
                     'success': True,
@@ -237,4 +469,23 @@ class UniversalPublisher:
             return {
                 'success': False,
                 'error': f'Erreur inattendue: {str(e)}'
-            }
\ No newline at end of file
+            }
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+def get_publisher() -> UniversalPublisher:
+    """
+    Publisher partagé par processus
+    Créé à la première utilisation, donc après le fork des workers Celery:
+    chaque processus garde sa propre session HTTP longue durée
+    Verrou à double vérification: les threads d'un worker (-P threads)
+    ne créent jamais deux publishers concurrents
+    """
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = UniversalPublisher()
+    return _publisher
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-15 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0005_allow_null_temporarily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='validation_state',
+            field=models.CharField(choices=[('valid', 'Valide'), ('invalid', 'Invalide'), ('unknown', 'Inconnu')], default='unknown', help_text='Résultat de la dernière validation pour la plateforme', max_length=20),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.13 on 2026-10-15 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0006_post_validation_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-created_at'], name='post_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_active', 'status'], name='post_active_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialaccount',
+            index=models.Index(fields=['platform', 'is_active'], name='sa_platform_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialaccount',
+            index=models.Index(fields=['-last_used_at'], name='sa_last_used_idx'),
+        ),
+    ]
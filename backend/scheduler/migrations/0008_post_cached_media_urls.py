@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-15 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0007_post_and_socialaccount_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='cached_media_urls',
+            field=models.JSONField(blank=True, default=list, help_text="URLs des images liées, dans l'ordre de publication"),
+        ),
+    ]
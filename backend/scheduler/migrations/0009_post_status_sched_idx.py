@@ -0,0 +1,17 @@
+# Generated by Django 5.1.13 on 2026-10-15 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0008_post_cached_media_urls'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['scheduled_time'], name='post_status_sched_idx'),
+        ),
+    ]
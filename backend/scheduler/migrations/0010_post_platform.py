@@ -0,0 +1,31 @@
+# Generated by Django 5.1.13 on 2026-10-15 12:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_post_platform(apps, schema_editor):
+    """Recopier la plateforme du compte social sur les posts existants"""
+    Post = apps.get_model('scheduler', 'Post')
+    SocialAccount = apps.get_model('scheduler', 'SocialAccount')
+    Post.objects.filter(social_account__isnull=False).update(
+        platform=Subquery(
+            SocialAccount.objects.filter(pk=OuterRef('social_account_id')).values('platform')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0009_post_status_sched_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='platform',
+            field=models.CharField(blank=True, choices=[('facebook_page', 'Facebook Page'), ('facebook_group', 'Facebook Groupe'), ('instagram_feed', 'Instagram Feed'), ('instagram_story', 'Instagram Story'), ('instagram_reels', 'Instagram Reels'), ('twitter_post', 'Twitter/X Post'), ('linkedin_personal', 'LinkedIn Personnel'), ('linkedin_company', 'LinkedIn Entreprise'), ('tiktok_post', 'TikTok Post'), ('youtube_short', 'YouTube Short')], db_index=True, help_text='Plateforme du compte social (synchronisée automatiquement)', max_length=30),
+        ),
+        migrations.RunPython(backfill_post_platform, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.13 on 2026-10-15 12:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_media_assets_count(apps, schema_editor):
+    """Initialiser le compteur avec le nombre d'assets déjà liés"""
+    Post = apps.get_model('scheduler', 'Post')
+    PostMediaAsset = apps.get_model('scheduler', 'PostMediaAsset')
+    counts = (
+        PostMediaAsset.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Post.objects.update(media_assets_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0010_post_platform'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='media_assets_count',
+            field=models.PositiveIntegerField(default=0, help_text="Nombre d'assets média liés"),
+        ),
+        migrations.RunPython(backfill_media_assets_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.13 on 2026-10-15 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0011_post_media_assets_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='socialaccount',
+            name='last_validated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='socialaccount',
+            name='error_message',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.13 on 2026-10-15 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0012_socialaccount_validation_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='socialaccount',
+            name='scheduler_s_user_id_331ced_idx',
+        ),
+        migrations.AddIndex(
+            model_name='socialaccount',
+            index=models.Index(fields=['user', 'platform', '-created_at'], name='sa_user_plat_created'),
+        ),
+        migrations.AddIndex(
+            model_name='socialaccount',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'is_active'], name='sa_user_active'),
+        ),
+    ]
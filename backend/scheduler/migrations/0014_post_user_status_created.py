@@ -0,0 +1,21 @@
+# Generated by Django 5.1.13 on 2026-10-15 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0013_socialaccount_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='scheduler_p_user_id_f6d0a7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', 'status', '-created_at'], name='post_user_status_created'),
+        ),
+    ]
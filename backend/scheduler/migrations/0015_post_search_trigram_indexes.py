@@ -0,0 +1,38 @@
+# Generated by Django 5.1.13 on 2026-10-15 18:05
+
+from django.db import migrations
+
+# Colonnes interrogées par SearchFilter (PostViewSet.search_fields) en ILIKE '%q%'
+TRIGRAM_INDEXES = (
+    ('post_title_trgm', 'title'),
+    ('post_content_trgm', 'content'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Index GIN trigramme, uniquement sous PostgreSQL (SQLite en développement)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON scheduler_post USING GIN ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0014_post_user_status_created'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
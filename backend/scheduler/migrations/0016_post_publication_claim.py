@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-15 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0015_post_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='publication_claim',
+            field=models.CharField(blank=True, editable=False, help_text='Jeton de réservation de la publication en cours', max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.13 on 2026-10-15 20:40
+
+from django.db import migrations
+
+BACKFILL_CHUNK_SIZE = 500
+
+
+class _ValidatedPost:
+    """
+    Vue minimale d'un post historique pour les validateurs de plateforme
+    Le modèle historique n'a pas les méthodes de Post (has_media_asset)
+    """
+
+    def __init__(self, post):
+        self.content = post.content
+        self.image = post.image
+        self.video = post.video
+        self._asset_types = {asset.file_type for asset in post.media_assets.all()}
+
+    def has_media_asset(self, file_type):
+        return file_type in self._asset_types
+
+
+def backfill_validation_state(apps, schema_editor):
+    """Calculer validation_state des posts restés à 'unknown' depuis 0006"""
+    from scheduler.models import _DEFAULT_PLATFORM_VALIDATOR, _PLATFORM_VALIDATORS
+
+    Post = apps.get_model('scheduler', 'Post')
+    posts = (
+        Post.objects.filter(validation_state='unknown')
+        .select_related('social_account')
+        .prefetch_related('media_assets')
+        .only('id', 'content', 'image', 'video', 'platform', 'social_account__platform')
+        .iterator(chunk_size=BACKFILL_CHUNK_SIZE)
+    )
+
+    ids_by_state = {'valid': [], 'invalid': []}
+    for post in posts:
+        platform = post.platform or (post.social_account.platform if post.social_account else None)
+        if not platform:
+            ids_by_state['invalid'].append(post.pk)
+            continue
+        validator = _PLATFORM_VALIDATORS.get(platform, _DEFAULT_PLATFORM_VALIDATOR)
+        errors = validator(_ValidatedPost(post))
+        ids_by_state['invalid' if errors else 'valid'].append(post.pk)
+
+    for state, ids in ids_by_state.items():
+        for i in range(0, len(ids), BACKFILL_CHUNK_SIZE):
+            Post.objects.filter(pk__in=ids[i:i + BACKFILL_CHUNK_SIZE]).update(validation_state=state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0016_post_publication_claim'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_validation_state, migrations.RunPython.noop),
+    ]
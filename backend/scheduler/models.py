@@ -2,9 +2,12 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.validators import MinLengthValidator
-from celery import current_app
-import uuid
+from django.utils.functional import cached_property
+from types import MappingProxyType
+import hashlib
 
 User = get_user_model()
 
@@ -30,9 +33,167 @@ class PostStatus(models.TextChoices):
     FAILED = 'failed', 'Échec'
     CANCELLED = 'cancelled', 'Annulé'
 
+class ValidationState(models.TextChoices):
+    """Résultat stocké de la validation par plateforme"""
+    VALID = 'valid', 'Valide'
+    INVALID = 'invalid', 'Invalide'
+    UNKNOWN = 'unknown', 'Inconnu'
+
+# Champs dont une modification impose de recalculer validation_state
+_VALIDATION_FIELDS = frozenset({'content', 'social_account', 'image', 'video'})
+
+# Colonnes inutiles à la publication, non chargées par Post.publication_queryset()
+_PUBLICATION_DEFERRED_FIELDS = (
+    'title', 'platforms', 'platform_configs', 'error_message', 'celery_task_id',
+    'social_account__platform_config',
+)
+
+# Règles et capacités par plateforme, construites une seule fois à l'import
+_PLATFORM_RULES = MappingProxyType({
+    SocialPlatform.FACEBOOK_PAGE: MappingProxyType({
+        'max_length': 63206,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 10,
+        'max_hashtags': 30,
+    }),
+    SocialPlatform.INSTAGRAM_FEED: MappingProxyType({
+        'max_length': 2200,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 10,
+        'max_hashtags': 30,
+        'required_assets': ('image',),
+    }),
+    SocialPlatform.INSTAGRAM_STORY: MappingProxyType({
+        'max_length': 2200,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 1,
+        'required_assets': ('image',),
+        'max_video_duration': 15,
+    }),
+    SocialPlatform.TWITTER_POST: MappingProxyType({
+        'max_length': 280,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 4,
+        'max_hashtags': 10,
+    }),
+    SocialPlatform.LINKEDIN_PERSONAL: MappingProxyType({
+        'max_length': 3000,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 9,
+    }),
+    SocialPlatform.TIKTOK_POST: MappingProxyType({
+        'max_length': 2200,
+        'supports_videos': True,
+        'required_assets': ('video',),
+        'max_video_duration': 180,
+    }),
+})
+
+_NO_PLATFORM_RULES = MappingProxyType({})
+
+_DEFAULT_PLATFORM_RULES = MappingProxyType({
+    'max_length': 1000,
+    'supports_images': True,
+    'supports_videos': False,
+})
+
+_PLATFORM_CAPABILITIES = MappingProxyType({
+    SocialPlatform.FACEBOOK_PAGE: MappingProxyType({
+        'supports_scheduling': True,
+        'supports_images': True,
+        'supports_videos': True,
+        'supports_carousel': True,
+        'max_images': 10,
+    }),
+    SocialPlatform.INSTAGRAM_FEED: MappingProxyType({
+        'supports_scheduling': True,
+        'supports_images': True,
+        'supports_videos': True,
+        'supports_carousel': True,
+        'max_images': 10,
+        'requires_image': True,
+    }),
+    SocialPlatform.INSTAGRAM_STORY: MappingProxyType({
+        'supports_scheduling': False,  # Stories sont généralement immédiates
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 1,
+        'ephemeral': True,
+    }),
+    SocialPlatform.TWITTER_POST: MappingProxyType({
+        'supports_scheduling': True,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 4,
+        'supports_threading': True,
+    }),
+    SocialPlatform.LINKEDIN_PERSONAL: MappingProxyType({
+        'supports_scheduling': True,
+        'supports_images': True,
+        'supports_videos': True,
+        'max_images': 9,
+        'professional_focus': True,
+    }),
+    SocialPlatform.TIKTOK_POST: MappingProxyType({
+        'supports_scheduling': False,  # TikTok ne supporte pas la planification
+        'supports_videos': True,
+        'requires_video': True,
+        'vertical_format': True,
+    }),
+})
+
+_DEFAULT_PLATFORM_CAPABILITIES = MappingProxyType({
+    'supports_scheduling': True,
+    'supports_images': True,
+})
+
+def _build_platform_validator(rules):
+    """
+    Validateur spécialisé pour un jeu de règles
+    Les limites sont lues une fois et figées dans la closure
+    """
+    max_length = rules.get('max_length', 1000)
+    required_assets = rules.get('required_assets', ())
+    requires_image = 'image' in required_assets
+    requires_video = 'video' in required_assets
+    
+    def validate(post):
+        errors = []
+        
+        # Vérifier la longueur du contenu
+        content_length = len(post.content)
+        if content_length > max_length:
+            errors.append(f"Contenu trop long ({content_length}/{max_length} caractères)")
+        
+        # Vérifier les assets requis
+        if requires_image and not (post.image or post.has_media_asset('image')):
+            errors.append("Une image est requise pour cette plateforme")
+        if requires_video and not (post.video or post.has_media_asset('video')):
+            errors.append("Une vidéo est requise pour cette plateforme")
+        
+        return errors
+    
+    return validate
+
+_PLATFORM_VALIDATORS = MappingProxyType({
+    platform: _build_platform_validator(rules)
+    for platform, rules in _PLATFORM_RULES.items()
+})
+
+_DEFAULT_PLATFORM_VALIDATOR = _build_platform_validator(_DEFAULT_PLATFORM_RULES)
+
 class Post(models.Model):
     """Modèle amélioré pour les posts à planifier"""
     
+    # Choix accessibles depuis le modèle (Post.PostStatus.SCHEDULED)
+    PostStatus = PostStatus
+    SocialPlatform = SocialPlatform
+    
     # Identifiants
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     social_account = models.ForeignKey(
@@ -41,6 +202,14 @@ class Post(models.Model):
         related_name="posts",
         help_text="Compte social cible pour la publication"
     )
+    # Plateforme du compte social, dénormalisée pour éviter la jointure à la publication
+    platform = models.CharField(
+        choices=SocialPlatform.choices,
+        max_length=30,
+        blank=True,
+        db_index=True,
+        help_text="Plateforme du compte social (synchronisée automatiquement)"
+    )
 
     
     # Contenu principal
@@ -66,6 +235,12 @@ class Post(models.Model):
     # Planification
     scheduled_time = models.DateTimeField(null=True, blank=True)
     status = models.CharField(choices=PostStatus.choices, default=PostStatus.DRAFT, max_length=20)
+    validation_state = models.CharField(
+        choices=ValidationState.choices,
+        default=ValidationState.UNKNOWN,
+        max_length=20,
+        help_text="Résultat de la dernière validation pour la plateforme"
+    )
     
     # Médias (gardé pour compatibilité, mais utilisation de media_assets recommandée)
     image = models.ImageField(upload_to='posts/images/', blank=True, null=True)
@@ -79,6 +254,17 @@ class Post(models.Model):
         blank=True,
         help_text="Assets média liés à ce post"
     )
+    # Nombre d'assets liés, tenu à jour par les signaux de PostMediaAsset
+    media_assets_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Nombre d'assets média liés"
+    )
+    # URLs des images liées, recalculées à chaque ajout/retrait de média (voir signals)
+    cached_media_urls = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="URLs des images liées, dans l'ordre de publication"
+    )
     
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
@@ -87,6 +273,14 @@ class Post(models.Model):
     
     # Résultats et suivi
     celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    # Jeton de la tâche qui a réservé le post pour le publier (passage en PUBLISHING)
+    publication_claim = models.CharField(
+        max_length=32,
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Jeton de réservation de la publication en cours"
+    )
     platform_post_id = models.CharField(
         max_length=255, 
         blank=True, 
@@ -101,15 +295,31 @@ class Post(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'status']),
+            # Listes par statut d'un utilisateur, déjà triées par date de création
+            models.Index(fields=['user', 'status', '-created_at'], name='post_user_status_created'),
             models.Index(fields=['scheduled_time']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['status', '-created_at'], name='post_status_created_idx'),
+            models.Index(fields=['is_active', 'status'], name='post_active_status_idx'),
+            # Index partiel: ne contient que les posts planifiés (scan des posts échus)
+            models.Index(
+                fields=['scheduled_time'],
+                name='post_status_sched_idx',
+                condition=models.Q(status='scheduled'),
+            ),
         ]
         
     def __str__(self):
         title = self.title or self.content[:50] + "..." if len(self.content) > 50 else self.content
         return f"{self.user.email} - {title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Compte social tel que chargé, pour resynchroniser platform s'il change
+        instance._loaded_social_account_id = instance.__dict__.get('social_account_id')
+        return instance
+    
     def clean(self):
         """Validations personnalisées"""
         super().clean()
@@ -126,34 +336,25 @@ class Post(models.Model):
             
         super().save(*args, **kwargs)
         
-        # Programmer la tâche Celery après sauvegarde
-        if (self.status == PostStatus.SCHEDULED and 
-            self.scheduled_time and 
-            not self.celery_task_id):
-            self.schedule_publication()
-    
-    def schedule_publication(self):
-        """Programmer la publication via Celery"""
-        from .tasks import publish_post
+        # Recalculer l'état de validation si le contenu validé a changé
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or _VALIDATION_FIELDS.intersection(update_fields):
+            self.refresh_validation_state()
+    
+    def refresh_validation_state(self):
+        """Recalculer validation_state et l'enregistrer sans repasser par save()"""
+        # Le contenu a pu changer: le résultat mis en cache sur l'instance est recalculé
+        self.__dict__.pop('platform_validation_errors', None)
+        try:
+            errors = self.platform_validation_errors
+        except Exception:
+            state = ValidationState.UNKNOWN
+        else:
+            state = ValidationState.INVALID if errors else ValidationState.VALID
         
-        if self.scheduled_time and self.scheduled_time > timezone.now():
-            # Programmer la tâche
-            task = publish_post.apply_async(
-                args=[self.id],
-                eta=self.scheduled_time
-            )
-            
-            # Sauvegarder l'ID de la tâche
-            self.celery_task_id = task.id
-            self.save(update_fields=['celery_task_id'])
-    
-    def cancel_schedule(self):
-        """Annuler la planification"""
-        if self.celery_task_id:
-            current_app.control.revoke(self.celery_task_id, terminate=True)
-            self.celery_task_id = None
-            self.status = PostStatus.DRAFT
-            self.save(update_fields=['celery_task_id', 'status'])
+        if state != self.validation_state:
+            self.validation_state = state
+            Post.objects.filter(pk=self.pk).update(validation_state=state)
     
     @property
     def is_scheduled(self):
@@ -165,11 +366,6 @@ class Post(models.Model):
             return False
         return self.scheduled_time <= timezone.now()
     
-    @property
-    def media_assets_count(self):
-        """Nombre d'assets média liés"""
-        return self.media_assets.count()
-    
     @property
     def platforms_count(self):
         """Nombre de plateformes ciblées"""
@@ -186,93 +382,135 @@ class Post(models.Model):
         self.platform_configs[platform] = config
         self.save(update_fields=['platform_configs'])
     
+    @property
+    def target_platform(self):
+        """Plateforme cible: champ dénormalisé, sinon celle du compte social (post non enregistré)"""
+        if self.platform:
+            return self.platform
+        account = getattr(self, 'social_account', None)
+        return account.platform if account else None
+    
     def validate_for_platform(self):
         """Valider le contenu pour la plateforme du compte social associé"""
-        if not self.social_account:
+        if not self.target_platform:
             return ["Aucun compte social associé"]
             
-        platform = self.social_account.platform
-        rules = self.get_platform_rules()
-        errors = []
-        
-        # Vérifier la longueur du contenu
-        content_length = len(self.content)
-        max_length = rules.get('max_length', 1000)
-        if content_length > max_length:
-            errors.append(f"Contenu trop long ({content_length}/{max_length} caractères)")
+        validator = _PLATFORM_VALIDATORS.get(self.target_platform, _DEFAULT_PLATFORM_VALIDATOR)
+        return validator(self)
+    
+    def validate_and_rules(self):
+        """
+        Valider le contenu et renvoyer les règles appliquées en une seule passe
+        La plateforme cible n'est résolue qu'une fois
         
-        # Vérifier les assets requis
-        required_assets = rules.get('required_assets', [])
-        if 'image' in required_assets:
-            has_image = (self.image or 
-                        self.media_assets.filter(file_type='image').exists())
-            if not has_image:
-                errors.append("Une image est requise pour cette plateforme")
+        Returns:
+            Tuple (erreurs, règles)
+        """
+        platform = self.target_platform
+        if not platform:
+            return ["Aucun compte social associé"], _NO_PLATFORM_RULES
         
-        if 'video' in required_assets:
-            has_video = (self.video or 
-                        self.media_assets.filter(file_type='video').exists())
-            if not has_video:
-                errors.append("Une vidéo est requise pour cette plateforme")
+        validator = _PLATFORM_VALIDATORS.get(platform, _DEFAULT_PLATFORM_VALIDATOR)
+        return validator(self), _PLATFORM_RULES.get(platform, _DEFAULT_PLATFORM_RULES)
+    
+    @cached_property
+    def platform_validation_errors(self):
+        """Erreurs de validate_for_platform(), calculées une seule fois par instance"""
+        return self.validate_for_platform()
+    
+    def image_asset_names(self):
+        """
+        Noms de fichiers des images liées, dans l'ordre d'affichage
+        Lit le cache de prefetch_related s'il existe, sinon une requête values_list
+        sans construire d'instances
+        """
+        if 'post_media_assets' in getattr(self, '_prefetched_objects_cache', {}):
+            return [
+                post_asset.asset.file.name
+                for post_asset in self.post_media_assets.all()
+                if post_asset.asset.file_type == 'image'
+            ]
+        return list(
+            self.post_media_assets.filter(asset__file_type='image')
+            .order_by('order')
+            .values_list('asset__file', flat=True)
+        )
+    
+    def compute_media_urls(self):
+        """URLs des images liées, dans l'ordre d'affichage"""
+        return [default_storage.url(name) for name in self.image_asset_names() if name]
+    
+    def refresh_cached_media_urls(self):
+        """Recalcule cached_media_urls et l'enregistre seulement s'il a changé"""
+        urls = self.compute_media_urls()
+        if urls != self.cached_media_urls:
+            self.cached_media_urls = urls
+            Post.objects.filter(pk=self.pk).update(cached_media_urls=urls)
+    
+    def refresh_media_state(self):
+        """
+        Recalcule en une fois les champs dérivés des médias liés
+        À appeler après bulk_create, qui n'émet pas de signal par ligne
+        """
+        # Les listes préchargées ne reflètent plus les médias liés
+        if hasattr(self, '_prefetched_objects_cache'):
+            self._prefetched_objects_cache.clear()
         
-        return errors
+        count = self.post_media_assets.count()
+        if count != self.media_assets_count:
+            self.media_assets_count = count
+            Post.objects.filter(pk=self.pk).update(media_assets_count=count)
+        self.refresh_validation_state()
+        self.refresh_cached_media_urls()
+    
+    def has_media_asset(self, file_type):
+        """
+        Vérifie la présence d'un asset du type donné
+        Lit le cache de prefetch_related s'il existe, sinon une seule requête
+        """
+        if not self.pk:
+            return False
+        if 'media_assets' in getattr(self, '_prefetched_objects_cache', {}):
+            return any(asset.file_type == file_type for asset in self.media_assets.all())
+        return self.media_assets.filter(file_type=file_type).exists()
+    
+    @staticmethod
+    def stats_cache_key(user_id):
+        """Clé du cache des statistiques de posts d'un utilisateur"""
+        return f'post_stats:{user_id}'
+    
+    @classmethod
+    def publication_queryset(cls):
+        """
+        Posts avec compte social et médias préchargés pour la publication
+        Colonnes jamais lues par la publication différées (JSON, textes longs),
+        et pas de jointure sur l'utilisateur: seul user_id est utilisé
+        """
+        return cls.objects.select_related('social_account').defer(
+            *_PUBLICATION_DEFERRED_FIELDS
+        ).prefetch_related(
+            models.Prefetch(
+                'post_media_assets',
+                queryset=PostMediaAsset.objects.select_related('asset').order_by('order')
+            ),
+            'media_assets',
+        )
+    
+    @classmethod
+    def due_for_publication(cls, now=None):
+        """Posts planifiés dont l'heure de publication est atteinte"""
+        return cls.publication_queryset().filter(
+            status=PostStatus.SCHEDULED,
+            scheduled_time__lte=now or timezone.now(),
+            is_active=True,
+        )
     
     def get_platform_rules(self):
         """Règles de validation par plateforme"""
-        if not self.social_account:
-            return {}
-            
-        platform = self.social_account.platform
-        rules_map = {
-            SocialPlatform.FACEBOOK_PAGE: {
-                'max_length': 63206,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 10,
-                'max_hashtags': 30,
-            },
-            SocialPlatform.INSTAGRAM_FEED: {
-                'max_length': 2200,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 10,
-                'max_hashtags': 30,
-                'required_assets': ['image'],
-            },
-            SocialPlatform.INSTAGRAM_STORY: {
-                'max_length': 2200,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 1,
-                'required_assets': ['image'],
-                'max_video_duration': 15,
-            },
-            SocialPlatform.TWITTER_POST: {
-                'max_length': 280,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 4,
-                'max_hashtags': 10,
-            },
-            SocialPlatform.LINKEDIN_PERSONAL: {
-                'max_length': 3000,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 9,
-            },
-            SocialPlatform.TIKTOK_POST: {
-                'max_length': 2200,
-                'supports_videos': True,
-                'required_assets': ['video'],
-                'max_video_duration': 180,
-            },
-        }
-        
-        return rules_map.get(platform, {
-            'max_length': 1000,
-            'supports_images': True,
-            'supports_videos': False,
-        })
+        platform = self.target_platform
+        if not platform:
+            return _NO_PLATFORM_RULES
+        return _PLATFORM_RULES.get(platform, _DEFAULT_PLATFORM_RULES)
 
 class PostMediaAsset(models.Model):
     """Liaison entre Post et MediaAsset avec configuration"""
@@ -313,6 +551,8 @@ class PostMediaAsset(models.Model):
 
 class SocialAccount(models.Model):
     """Comptes de réseaux sociaux liés avec support étendu"""
+    SocialPlatform = SocialPlatform
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='social_accounts')
     platform = models.CharField(choices=SocialPlatform.choices, max_length=30)
     platform_user_id = models.CharField(max_length=255)
@@ -332,6 +572,8 @@ class SocialAccount(models.Model):
     # Statut et métadonnées
     is_active = models.BooleanField(default=True)
     last_used_at = models.DateTimeField(null=True, blank=True)
+    last_validated_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True, null=True)
     posts_count = models.PositiveIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -340,18 +582,52 @@ class SocialAccount(models.Model):
     class Meta:
         unique_together = ['user', 'platform', 'platform_user_id']
         indexes = [
-            models.Index(fields=['user', 'platform']),
+            # Liste des comptes d'un utilisateur triée sans tri supplémentaire
+            models.Index(fields=['user', 'platform', '-created_at'], name='sa_user_plat_created'),
+            models.Index(
+                fields=['user', 'is_active'],
+                name='sa_user_active',
+                condition=models.Q(is_active=True)
+            ),
             models.Index(fields=['is_active']),
+            models.Index(fields=['platform', 'is_active'], name='sa_platform_active_idx'),
+            models.Index(fields=['-last_used_at'], name='sa_last_used_idx'),
         ]
         
     def __str__(self):
         return f"{self.user.email} - {self.get_platform_display()} ({self.username})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Token tel que chargé, pour invalider les caches qui en dépendent
+        instance._loaded_access_token = instance.__dict__.get('access_token')
+        instance._loaded_platform = instance.__dict__.get('platform')
+        return instance
+    
+    @staticmethod
+    def token_validation_cache_key(access_token):
+        """Clé du cache de validation d'un token (jamais stocké en clair)"""
+        return 'fbtok:' + hashlib.sha256(access_token.encode()).hexdigest()
+    
+    @staticmethod
+    def accounts_list_cache_key(user_id):
+        """Clé du cache de la liste des comptes sociaux d'un utilisateur"""
+        return f'soc_accts:{user_id}'
+    
     def update_usage(self):
-        """Mettre à jour les statistiques d'utilisation"""
+        """
+        Mettre à jour les statistiques d'utilisation
+        Incrément atomique en base (F), sans course entre publications concurrentes
+        """
         self.last_used_at = timezone.now()
+        SocialAccount.objects.filter(pk=self.pk).update(
+            posts_count=models.F('posts_count') + 1,
+            last_used_at=self.last_used_at
+        )
         self.posts_count += 1
-        self.save(update_fields=['last_used_at', 'posts_count'])
+        # UPDATE direct: aucun signal post_save, la liste en cache est invalidée ici
+        cache.delete(self.accounts_list_cache_key(self.user_id))
     
     def is_token_expired(self):
         """Vérifier si le token a expiré"""
@@ -361,52 +637,4 @@ class SocialAccount(models.Model):
     
     def get_platform_capabilities(self):
         """Obtenir les capacités de la plateforme"""
-        capabilities = {
-            SocialPlatform.FACEBOOK_PAGE: {
-                'supports_scheduling': True,
-                'supports_images': True,
-                'supports_videos': True,
-                'supports_carousel': True,
-                'max_images': 10,
-            },
-            SocialPlatform.INSTAGRAM_FEED: {
-                'supports_scheduling': True,
-                'supports_images': True,
-                'supports_videos': True,
-                'supports_carousel': True,
-                'max_images': 10,
-                'requires_image': True,
-            },
-            SocialPlatform.INSTAGRAM_STORY: {
-                'supports_scheduling': False,  # Stories sont généralement immédiates
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 1,
-                'ephemeral': True,
-            },
-            SocialPlatform.TWITTER_POST: {
-                'supports_scheduling': True,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 4,
-                'supports_threading': True,
-            },
-            SocialPlatform.LINKEDIN_PERSONAL: {
-                'supports_scheduling': True,
-                'supports_images': True,
-                'supports_videos': True,
-                'max_images': 9,
-                'professional_focus': True,
-            },
-            SocialPlatform.TIKTOK_POST: {
-                'supports_scheduling': False,  # TikTok ne supporte pas la planification
-                'supports_videos': True,
-                'requires_video': True,
-                'vertical_format': True,
-            },
-        }
-        
-        return capabilities.get(self.platform, {
-            'supports_scheduling': True,
-            'supports_images': True,
-        })
+        return _PLATFORM_CAPABILITIES.get(self.platform, _DEFAULT_PLATFORM_CAPABILITIES)
@@ -2,23 +2,88 @@
 Vues pour l'authentification OAuth avec Facebook/Instagram
 """
 import logging
-from typing import Dict, Any
+import secrets
+from functools import lru_cache
 from urllib.parse import urlencode
 
+import orjson
+from celery.result import AsyncResult
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from django.utils import timezone
+from django.core import signing
+from django.core.cache import cache
 
-from .models import SocialAccount
-from .integrations.facebook_service import FacebookService, FacebookGraphAPIError
+from .models import SocialAccount, SocialPlatform
+from .integrations.facebook_service import FacebookService
 
 logger = logging.getLogger(__name__)
 
+# Libellés des plateformes, sans passer par get_platform_display()
+PLATFORM_DISPLAY = dict(SocialPlatform.choices)
+
+# Service sans état propre à la requête (identifiants de l'app et session HTTP partagée)
+_FB_SERVICE = FacebookService()
+
+@lru_cache(maxsize=None)
+def _callback_path() -> str:
+    """Chemin du callback OAuth, résolu une seule fois par processus"""
+    return reverse('scheduler:facebook_auth_callback')
+
+def _callback_url(request) -> str:
+    """URL absolue du callback OAuth"""
+    return f"{request.scheme}://{request.get_host()}{_callback_path()}"
+
+# Signature du paramètre state OAuth (user_id:platform:nonce), valable 10 minutes
+OAUTH_STATE_SALT = 'scheduler.oauth_state'
+OAUTH_STATE_MAX_AGE = 600
+_STATE_SIGNER = signing.TimestampSigner(salt=OAUTH_STATE_SALT)
+
+# Nonce à usage unique lié à la session qui a démarré l'authentification
+OAUTH_NONCE_SESSION_KEY = 'scheduler_oauth_nonce'
+
+def _sign_state(user_id: int, platform: str, nonce: str) -> str:
+    """Signe le state OAuth pour empêcher sa falsification"""
+    return _STATE_SIGNER.sign(f"{user_id}:{platform}:{nonce}")
+
+def _unsign_state(state: str):
+    """
+    Vérifie la signature et l'âge du state OAuth
+    
+    Returns:
+        Tuple (user_id, platform, nonce)
+    
+    Raises:
+        signing.BadSignature: state falsifié ou expiré
+        ValueError: contenu mal formé
+    """
+    payload = _STATE_SIGNER.unsign(state, max_age=OAUTH_STATE_MAX_AGE)
+    user_id, platform, nonce = payload.split(':', 2)
+    return int(user_id), platform, nonce
+
+# Suivi des provisionnements de comptes lancés par le callback OAuth
+PROVISIONING_TTL = 600
+
+def _provisioning_cache_key(token: str) -> str:
+    """Clé du cache associant un jeton de provisionnement à sa tâche"""
+    return f'soc_prov:{token}'
+
+# Colonnes renvoyées par social_accounts_list
+ACCOUNT_LIST_FIELDS = (
+    'id', 'platform', 'username', 'is_active', 'posts_count',
+    'last_used_at', 'last_validated_at', 'error_message', 'created_at',
+)
+
+# Durée de vie de la liste des comptes en cache (invalidée à chaque écriture)
+ACCOUNTS_LIST_CACHE_TTL = 300
+
+# Intervalle minimal (secondes) entre deux tests de connexion d'un même compte
+ACCOUNT_TEST_INTERVAL = 30
+
 @login_required
 @require_http_methods(["GET"])
 def facebook_auth_start(request):
@@ -34,15 +99,15 @@ def facebook_auth_start(request):
                 'error': f'Plateforme non supportée: {platform}'
             }, status=400)
         
-        facebook_service = FacebookService()
-        
-        # Construire l'URL de callback
-        callback_url = request.build_absolute_uri(reverse('scheduler:facebook_auth_callback'))
+        # Le nonce lie le state à cette session: un state obtenu par un tiers
+        # ne peut pas être rejoué dans le navigateur d'un autre utilisateur
+        nonce = secrets.token_urlsafe(16)
+        request.session[OAUTH_NONCE_SESSION_KEY] = nonce
         
         # Générer l'URL d'autorisation Facebook
-        auth_url = facebook_service.get_auth_url(
-            redirect_uri=callback_url,
-            state=f"{request.user.id}:{platform}"  # Inclure l'utilisateur et la plateforme
+        auth_url = _FB_SERVICE.get_auth_url(
+            redirect_uri=_callback_url(request),
+            state=_sign_state(request.user.id, platform, nonce)  # Utilisateur, plateforme et nonce, signés
         )
         
         logger.info(f"User {request.user.id} starting Facebook OAuth for {platform}")
@@ -79,103 +144,41 @@ def facebook_auth_callback(request):
             logger.error("Missing code or state in Facebook callback")
             return HttpResponseBadRequest("Paramètres manquants")
         
-        # Décoder le state (user_id:platform)
+        # Vérifier et décoder le state signé (user_id:platform:nonce)
+        # La signature prouve l'origine: aucune requête sur User n'est nécessaire
         try:
-            user_id, platform = state.split(':', 1)
-            user_id = int(user_id)
-        except (ValueError, AttributeError):
-            logger.error(f"Invalid state format: {state}")
+            user_id, platform, nonce = _unsign_state(state)
+        except signing.SignatureExpired:
+            logger.warning("Expired OAuth state in Facebook callback")
+            return HttpResponseBadRequest("State expiré")
+        except (signing.BadSignature, ValueError):
+            logger.error("Invalid OAuth state in Facebook callback")
             return HttpResponseBadRequest("State invalide")
         
-        # Vérifier que l'utilisateur existe (sécurité)
-        from django.contrib.auth.models import User
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            logger.error(f"User {user_id} not found")
-            return HttpResponseBadRequest("Utilisateur non trouvé")
+        # Le nonce doit être celui de la session qui a démarré l'authentification
+        # (protection CSRF du login), et ne sert qu'une fois
+        session_nonce = request.session.pop(OAUTH_NONCE_SESSION_KEY, None)
+        if not session_nonce or not secrets.compare_digest(nonce, session_nonce):
+            logger.error("OAuth state not bound to this session in Facebook callback")
+            return HttpResponseBadRequest("State invalide")
         
-        facebook_service = FacebookService()
-        callback_url = request.build_absolute_uri(reverse('scheduler:facebook_auth_callback'))
+        # L'échange du code et les appels Graph API se font dans une tâche Celery
+        from .tasks import provision_social_account
         
-        # Échanger le code contre un token d'accès
-        token_data = facebook_service.exchange_code_for_token(code, callback_url)
+        task = provision_social_account.delay(user_id, platform, code, _callback_url(request))
         
-        if platform == 'facebook_page':
-            # Pour Facebook Page, récupérer les pages disponibles
-            pages = facebook_service.get_user_pages(token_data['access_token'])
-            
-            if pages:
-                # Prendre la première page ou permettre à l'utilisateur de choisir
-                page = pages[0]  # Pour simplifier, on prend la première
-                
-                # Créer ou mettre à jour le compte social
-                social_account, created = SocialAccount.objects.update_or_create(
-                    user=user,
-                    platform='facebook_page',
-                    platform_user_id=page['id'],
-                    defaults={
-                        'platform_username': page['name'],
-                        'access_token': page['access_token'],  # Token de la page
-                        'token_expires_at': timezone.now() + timezone.timedelta(days=60),  # Long-lived token
-                        'is_active': True,
-                        'last_validated_at': timezone.now(),
-                        'platform_config': {
-                            'page_name': page['name'],
-                            'page_category': page.get('category', ''),
-                            'permissions': page.get('perms', [])
-                        }
-                    }
-                )
-                
-                action = 'créé' if created else 'mis à jour'
-                logger.info(f"Facebook page account {action} for user {user_id}: {page['name']}")
-                
-            else:
-                logger.warning(f"No Facebook pages found for user {user_id}")
-                return redirect("/dashboard/social-accounts?error=no_pages")
-            
-        elif platform in ['instagram_feed', 'instagram_story']:
-            # Pour Instagram, récupérer le compte Instagram Business
-            instagram_accounts = facebook_service.get_instagram_business_accounts(token_data['access_token'])
-            
-            if instagram_accounts:
-                # Prendre le premier compte Instagram ou permettre de choisir
-                ig_account = instagram_accounts[0]
-                
-                # Créer ou mettre à jour le compte social
-                social_account, created = SocialAccount.objects.update_or_create(
-                    user=user,
-                    platform=platform,
-                    platform_user_id=ig_account['id'],
-                    defaults={
-                        'platform_username': ig_account['username'],
-                        'access_token': token_data['access_token'],  # Token Facebook
-                        'token_expires_at': timezone.now() + timezone.timedelta(days=60),
-                        'is_active': True,
-                        'last_validated_at': timezone.now(),
-                        'platform_config': {
-                            'instagram_account_id': ig_account['id'],
-                            'username': ig_account['username'],
-                            'account_type': ig_account.get('account_type', 'BUSINESS')
-                        }
-                    }
-                )
-                
-                action = 'créé' if created else 'mis à jour'
-                logger.info(f"Instagram account {action} for user {user_id}: {ig_account['username']}")
-                
-            else:
-                logger.warning(f"No Instagram Business accounts found for user {user_id}")
-                return redirect("/dashboard/social-accounts?error=no_instagram")
+        # Jeton opaque interrogé par le frontend pour suivre le provisionnement
+        provisioning_token = secrets.token_urlsafe(16)
+        cache.set(
+            _provisioning_cache_key(provisioning_token),
+            {'task_id': task.id, 'user_id': user_id},
+            PROVISIONING_TTL
+        )
         
-        # Rediriger vers le dashboard avec succès
-        return redirect("/dashboard/social-accounts?success=connected")
+        logger.info(f"Provisioning {platform} account for user {user_id} (task {task.id})")
+        
+        return redirect(f"/dashboard/social-accounts?provisioning={provisioning_token}")
         
-    except FacebookGraphAPIError as e:
-        logger.error(f"Facebook API error in callback: {str(e)}")
-        return redirect(f"/dashboard/social-accounts?error=api_error")
-    
     except Exception as e:
         logger.error(f"Unexpected error in Facebook callback: {str(e)}")
         return redirect(f"/dashboard/social-accounts?error=unexpected")
@@ -187,22 +190,27 @@ def disconnect_social_account(request, account_id):
     Déconnecte un compte social (supprime ou désactive)
     """
     try:
-        social_account = SocialAccount.objects.get(
+        # Seules les colonnes modifiées ou affichées sont chargées (pas platform_config)
+        social_account = SocialAccount.objects.only(
+            'id', 'user_id', 'platform', 'is_active', 'access_token', 'error_message'
+        ).get(
             id=account_id,
-            user=request.user
+            user_id=request.user.id
         )
         
-        # Désactiver le compte plutôt que le supprimer pour garder l'historique
-        social_account.is_active = False
-        social_account.access_token = ''  # Effacer le token
-        social_account.error_message = 'Déconnecté par l\'utilisateur'
-        social_account.save(update_fields=['is_active', 'access_token', 'error_message'])
-        
-        logger.info(f"User {request.user.id} disconnected social account {account_id}")
+        # Compte déjà déconnecté (double clic): aucune écriture
+        if social_account.is_active or social_account.access_token:
+            # Désactiver le compte plutôt que le supprimer pour garder l'historique
+            social_account.is_active = False
+            social_account.access_token = ''  # Effacer le token
+            social_account.error_message = 'Déconnecté par l\'utilisateur'
+            social_account.save(update_fields=['is_active', 'access_token', 'error_message'])
+            
+            logger.info(f"User {request.user.id} disconnected social account {account_id}")
         
         return JsonResponse({
             'success': True,
-            'message': f'Compte {social_account.get_platform_display()} déconnecté'
+            'message': f'Compte {PLATFORM_DISPLAY.get(social_account.platform, social_account.platform)} déconnecté'
         })
         
     except SocialAccount.DoesNotExist:
@@ -223,16 +231,32 @@ def test_social_account(request, account_id):
     Teste la connexion d'un compte social
     """
     try:
-        social_account = SocialAccount.objects.get(
+        # Appartenance et état du compte, sans construire d'instance de modèle
+        account = SocialAccount.objects.filter(
             id=account_id,
-            user=request.user
-        )
+            user_id=request.user.id
+        ).values_list('is_active', 'access_token').first()
+        if account is None:
+            raise SocialAccount.DoesNotExist
+        
+        # Compte désactivé ou sans token: le test échouerait, inutile de lancer la tâche
+        is_active, access_token = account
+        if not is_active or not access_token:
+            return JsonResponse({
+                'error': 'Compte inactif ou sans token'
+            }, status=400)
+        
+        # Un test au plus toutes les 30 secondes par compte et par utilisateur
+        if not cache.add(f'soc_test:{request.user.id}:{account_id}', 1, ACCOUNT_TEST_INTERVAL):
+            return JsonResponse({
+                'error': 'Test déjà lancé, réessayez dans quelques secondes'
+            }, status=429)
         
         # Utiliser la tâche Celery pour tester
         from .tasks import test_social_account_connection
         
         # Lancer le test en arrière-plan
-        task = test_social_account_connection.delay(social_account.id)
+        task = test_social_account_connection.delay(account_id)
         
         return JsonResponse({
             'success': True,
@@ -258,32 +282,51 @@ def social_accounts_list(request):
     Liste les comptes sociaux de l'utilisateur
     """
     try:
-        accounts = SocialAccount.objects.filter(
-            user=request.user
-        ).order_by('platform', '-created_at')
-        
-        accounts_data = []
-        for account in accounts:
-            accounts_data.append({
-                'id': account.id,
-                'platform': account.platform,
-                'platform_display': account.get_platform_display(),
-                'username': account.platform_username,
-                'is_active': account.is_active,
-                'posts_count': account.posts_count,
-                'last_used_at': account.last_used_at.isoformat() if account.last_used_at else None,
-                'last_validated_at': account.last_validated_at.isoformat() if account.last_validated_at else None,
-                'error_message': account.error_message,
-                'created_at': account.created_at.isoformat()
+        # Corps JSON déjà encodé mis en cache: un HIT ne réencode rien
+        cache_key = SocialAccount.accounts_list_cache_key(request.user.id)
+        content = cache.get(cache_key)
+        if content is None:
+            # Dictionnaires bruts: aucune instance de modèle construite,
+            # les dates sont sérialisées en ISO 8601 directement par orjson
+            accounts = list(SocialAccount.objects.filter(
+                user=request.user
+            ).order_by('platform', '-created_at').values(*ACCOUNT_LIST_FIELDS))
+            
+            for account in accounts:
+                account['platform_display'] = PLATFORM_DISPLAY.get(account['platform'], account['platform'])
+            
+            content = orjson.dumps({
+                'accounts': accounts,
+                'total': len(accounts)
             })
+            cache.set(cache_key, content, ACCOUNTS_LIST_CACHE_TTL)
         
-        return JsonResponse({
-            'accounts': accounts_data,
-            'total': len(accounts_data)
-        })
+        return HttpResponse(content, content_type='application/json')
         
     except Exception as e:
         logger.error(f"Error listing social accounts for user {request.user.id}: {str(e)}")
         return JsonResponse({
             'error': 'Erreur lors de la récupération des comptes'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+@login_required
+@require_http_methods(["GET"])
+def social_account_provisioning_status(request, token):
+    """
+    État du provisionnement d'un compte social lancé par le callback OAuth
+    """
+    entry = cache.get(_provisioning_cache_key(token))
+    if entry is None or entry['user_id'] != request.user.id:
+        return JsonResponse({
+            'error': 'Provisionnement non trouvé'
+        }, status=404)
+    
+    result = AsyncResult(entry['task_id'])
+    if not result.ready():
+        return JsonResponse({'status': 'pending', 'state': result.state})
+    
+    if result.successful():
+        return JsonResponse({'state': result.state, **result.result})
+    
+    logger.error(f"Provisioning task {entry['task_id']} failed for user {request.user.id}")
+    return JsonResponse({'status': 'error', 'error': 'unexpected', 'state': result.state})
@@ -1,11 +1,40 @@
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.core.exceptions import ValidationError as DjangoValidationError
 
 from .models import Post, SocialAccount, PostMediaAsset, SocialPlatform
 from media.models import MediaAsset
 from media.serializers import MediaAssetSerializer
 
+def build_post_media_assets(post, media_assets_data):
+    """Unsaved PostMediaAsset rows for bulk_create, ordered as submitted"""
+    return [
+        PostMediaAsset(
+            post=post,
+            asset_id=asset_data['asset_id'],
+            order=i,
+            platform_configs=asset_data.get('platform_configs', {})
+        )
+        for i, asset_data in enumerate(media_assets_data)
+    ]
+
+def check_media_asset_ownership(media_assets_data, user):
+    """
+    Verify in one query that every referenced asset exists and belongs to the user
+    (asset ownership is checked here rather than per nested item)
+    """
+    ids = {asset_data['asset_id'] for asset_data in media_assets_data or ()}
+    if not ids:
+        return
+    owned = set(MediaAsset.objects.filter(id__in=ids, user=user).values_list('id', flat=True))
+    missing = sorted(ids - owned)
+    if missing:
+        raise serializers.ValidationError({
+            'media_assets': [f"Media asset not found or access denied: {missing}"]
+        })
+
 class SocialAccountSerializer(serializers.ModelSerializer):
     """Enhanced serializer for social media accounts with platform capabilities"""
     platform_display = serializers.CharField(source='get_platform_display', read_only=True)
@@ -21,8 +50,12 @@ class SocialAccountSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'posts_count', 'last_used_at', 'created_at', 'updated_at']
 
     def get_platform_capabilities(self, obj) -> dict:
-        """Get platform-specific capabilities and limits"""
-        return obj.get_platform_capabilities()
+        """Get platform-specific capabilities and limits, resolved once per platform per request"""
+        # Nested serializers share the root context, so the memo covers the whole page
+        capabilities = self.context.setdefault('platform_caps', {})
+        if obj.platform not in capabilities:
+            capabilities[obj.platform] = obj.get_platform_capabilities()
+        return capabilities[obj.platform]
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -36,17 +69,6 @@ class PostMediaAssetSerializer(serializers.ModelSerializer):
     class Meta:
         model = PostMediaAsset
         fields = ['asset', 'asset_id', 'order', 'platform_configs']
-        
-    def validate_asset_id(self, value):
-        """Validate that the asset exists and belongs to the user"""
-        try:
-            asset = MediaAsset.objects.get(id=value)
-            request = self.context.get('request')
-            if request and asset.user != request.user:
-                raise serializers.ValidationError("Media asset not found or access denied")
-            return value
-        except MediaAsset.DoesNotExist:
-            raise serializers.ValidationError("Media asset not found")
 
 class PostCreateSerializer(serializers.ModelSerializer):
     """Enhanced serializer for creating posts with media assets and platform targeting"""
@@ -70,6 +92,8 @@ class PostCreateSerializer(serializers.ModelSerializer):
             account = SocialAccount.objects.get(id=value, user=self.context['request'].user)
             if not account.is_active:
                 raise serializers.ValidationError("Social account is not active")
+            # Reused by validate() and create() instead of fetching it again
+            self._social_account = account
             return value
         except SocialAccount.DoesNotExist:
             raise serializers.ValidationError("Social account not found or access denied")
@@ -90,11 +114,11 @@ class PostCreateSerializer(serializers.ModelSerializer):
     
     def validate(self, attrs):
         """Cross-field validation including platform-specific rules"""
-        # Get the social account for platform-specific validation
-        social_account = SocialAccount.objects.get(
-            id=attrs['social_account_id'], 
-            user=self.context['request'].user
-        )
+        check_media_asset_ownership(attrs.get('media_assets'), self.context['request'].user)
+        
+        # Social account already fetched by validate_social_account_id
+        social_account = self._social_account
+        attrs['_social_account_instance'] = social_account
         
         # Create a temporary post instance for validation
         temp_post = Post(
@@ -121,6 +145,12 @@ class PostCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         media_assets_data = validated_data.pop('media_assets', [])
         
+        # Use the validated account instance rather than its id
+        social_account = validated_data.pop('_social_account_instance', None)
+        if social_account is not None:
+            validated_data.pop('social_account_id', None)
+            validated_data['social_account'] = social_account
+        
         # Set user and determine status
         validated_data['user'] = self.context['request'].user
         
@@ -129,17 +159,15 @@ class PostCreateSerializer(serializers.ModelSerializer):
         else:
             validated_data['status'] = Post.PostStatus.DRAFT
         
-        # Create the post
-        post = super().create(validated_data)
-        
-        # Create media asset relationships
-        for i, asset_data in enumerate(media_assets_data):
-            PostMediaAsset.objects.create(
-                post=post,
-                asset_id=asset_data['asset_id'],
-                order=i,
-                platform_configs=asset_data.get('platform_configs', {})
-            )
+        # Create the post and its media asset relationships together
+        with transaction.atomic():
+            post = super().create(validated_data)
+            if media_assets_data:
+                PostMediaAsset.objects.bulk_create(
+                    build_post_media_assets(post, media_assets_data),
+                    batch_size=200
+                )
+                post.refresh_media_state()
         
         return post
 
@@ -170,16 +198,24 @@ class PostSerializer(serializers.ModelSerializer):
         ]
     
     def get_media_assets(self, obj) -> list:
-        """Get ordered media assets for the post"""
-        return PostMediaAssetSerializer(
-            obj.postmediaasset_set.all().order_by('order'), 
-            many=True
-        ).data
+        """Get ordered media assets for the post (prefetched by PostViewSet)"""
+        post_assets = getattr(obj, 'ordered_media', None)
+        if post_assets is None:
+            post_assets = obj.post_media_assets.select_related('asset').order_by('order')
+        serializer = self._post_media_asset_serializer
+        return [serializer.to_representation(post_asset) for post_asset in post_assets]
+    
+    @cached_property
+    def _post_media_asset_serializer(self):
+        """One media serializer per PostSerializer, reused for every post of a list"""
+        return PostMediaAssetSerializer(context=self.context)
     
     def get_platform_validation_status(self, obj) -> dict:
-        """Get platform validation status"""
+        """Get platform validation status (skipped when the view disables it)"""
+        if not self.context.get('include_validation', True):
+            return None
         try:
-            errors = obj.validate_for_platform()
+            errors = obj.platform_validation_errors
             return {
                 'is_valid': len(errors) == 0,
                 'errors': errors
@@ -215,6 +251,8 @@ class PostUpdateSerializer(serializers.ModelSerializer):
         """Platform-specific validation for updates"""
         if not self.instance:
             return attrs
+        
+        check_media_asset_ownership(attrs.get('media_assets'), self.context['request'].user)
             
         # Create updated instance for validation
         temp_instance = self.instance
@@ -246,56 +284,21 @@ class PostUpdateSerializer(serializers.ModelSerializer):
             else:
                 instance.status = Post.PostStatus.DRAFT
         
-        # Update the post
-        instance = super().update(instance, validated_data)
-        
-        # Update media assets if provided
-        if media_assets_data is not None:
-            # Remove existing media assets
-            instance.postmediaasset_set.all().delete()
+        with transaction.atomic():
+            # Update the post
+            instance = super().update(instance, validated_data)
             
-            # Add new media assets
-            for i, asset_data in enumerate(media_assets_data):
-                PostMediaAsset.objects.create(
-                    post=instance,
-                    asset_id=asset_data['asset_id'],
-                    order=i,
-                    platform_configs=asset_data.get('platform_configs', {})
+            # Replace media assets if provided
+            if media_assets_data is not None:
+                instance.post_media_assets.all().delete()
+                PostMediaAsset.objects.bulk_create(
+                    build_post_media_assets(instance, media_assets_data),
+                    batch_size=200
                 )
+                instance.refresh_media_state()
         
         return instance
 
-class PostValidationSerializer(serializers.Serializer):
-    """Serializer for validating post content against platform rules"""
-    content = serializers.CharField()
-    platform = serializers.ChoiceField(choices=SocialPlatform.choices)
-    media_asset_ids = serializers.ListField(
-        child=serializers.IntegerField(),
-        required=False,
-        allow_empty=True
-    )
-    
-    def validate(self, attrs):
-        """Validate content against platform rules"""
-        # Create temporary post for validation
-        temp_post = Post(
-            content=attrs['content'],
-            social_account=SocialAccount(platform=attrs['platform'])
-        )
-        
-        # Add media assets for validation if provided
-        if attrs.get('media_asset_ids'):
-            # In a real implementation, you'd fetch and validate these assets
-            pass
-        
-        validation_errors = temp_post.validate_for_platform()
-        
-        return {
-            'is_valid': len(validation_errors) == 0,
-            'errors': validation_errors,
-            'platform_rules': temp_post.get_platform_rules()
-        }
-
 class PostValidationSerializer(serializers.Serializer):
     """Serializer for validating post content without saving"""
     content = serializers.CharField(max_length=10000)
@@ -308,8 +311,6 @@ class PostValidationSerializer(serializers.Serializer):
     
     def validate(self, attrs):
         """Validate content against platform rules"""
-        from .models import SocialAccount
-        
         # Create a temporary social account for validation
         temp_account = SocialAccount(platform=attrs['platform'])
         
@@ -319,8 +320,7 @@ class PostValidationSerializer(serializers.Serializer):
             social_account=temp_account
         )
         
-        validation_errors = temp_post.validate_for_platform()
-        platform_rules = temp_post.get_platform_rules()
+        validation_errors, platform_rules = temp_post.validate_and_rules()
         
         return {
             'content': attrs['content'],
@@ -0,0 +1,91 @@
+"""
+Signaux du scheduler
+Maintiennent à jour les champs dénormalisés des posts et les caches associés
+"""
+from django.core.cache import cache
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Post, PostMediaAsset, SocialAccount
+
+
+def _refresh_post_media_state(post_id):
+    """Recalculer l'état dépendant des médias d'un post"""
+    post = Post.objects.select_related('social_account').filter(pk=post_id).first()
+    if post is not None:
+        post.refresh_validation_state()
+        post.refresh_cached_media_urls()
+
+
+@receiver(pre_save, sender=Post)
+def sync_post_platform(sender, instance, **kwargs):
+    """Aligner Post.platform sur la plateforme du compte social"""
+    if not instance.social_account_id:
+        return
+    # Nouveau post: la plateforme fournie à la création est conservée
+    loaded_account_id = getattr(instance, '_loaded_social_account_id', instance.social_account_id)
+    if Post.social_account.is_cached(instance):
+        instance.platform = instance.social_account.platform
+    elif not instance.platform or loaded_account_id != instance.social_account_id:
+        # Compte réaffecté par son id (relation non chargée): plateforme relue
+        instance.platform = SocialAccount.objects.filter(
+            pk=instance.social_account_id
+        ).values_list('platform', flat=True).first() or ''
+    instance._loaded_social_account_id = instance.social_account_id
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    """Un post créé, modifié ou supprimé invalide les statistiques en cache"""
+    cache.delete(Post.stats_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=PostMediaAsset)
+def post_media_asset_saved(sender, instance, created, **kwargs):
+    """Un média ajouté ou modifié peut changer la validité du post"""
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            media_assets_count=F('media_assets_count') + 1
+        )
+    _refresh_post_media_state(instance.post_id)
+
+
+@receiver(post_delete, sender=PostMediaAsset)
+def post_media_asset_deleted(sender, instance, origin=None, **kwargs):
+    """Un média retiré peut changer la validité du post"""
+    # Suppression en cascade d'un post: il n'y a plus rien à tenir à jour
+    if isinstance(origin, Post) or (isinstance(origin, QuerySet) and origin.model is Post):
+        return
+    Post.objects.filter(pk=instance.post_id, media_assets_count__gt=0).update(
+        media_assets_count=F('media_assets_count') - 1
+    )
+    # Suppression en masse (remplacement des médias): l'appelant recalcule une seule
+    # fois avec Post.refresh_media_state() au lieu d'un recalcul par ligne
+    if isinstance(origin, QuerySet):
+        return
+    _refresh_post_media_state(instance.post_id)
+
+
+@receiver(post_save, sender=SocialAccount)
+def social_account_saved(sender, instance, **kwargs):
+    """Un token remplacé invalide sa validation en cache; une plateforme modifiée est propagée"""
+    previous_token = getattr(instance, '_loaded_access_token', None)
+    if previous_token and previous_token != instance.access_token:
+        cache.delete(SocialAccount.token_validation_cache_key(previous_token))
+    instance._loaded_access_token = instance.access_token
+    
+    # Une plateforme modifiée est reportée sur les posts du compte
+    previous_platform = getattr(instance, '_loaded_platform', None)
+    if previous_platform and previous_platform != instance.platform:
+        Post.objects.filter(social_account=instance).update(platform=instance.platform)
+    instance._loaded_platform = instance.platform
+    
+    cache.delete(SocialAccount.accounts_list_cache_key(instance.user_id))
+
+
+@receiver(post_delete, sender=SocialAccount)
+def social_account_deleted(sender, instance, **kwargs):
+    """Un compte supprimé invalide la liste en cache de son utilisateur"""
+    cache.delete(SocialAccount.accounts_list_cache_key(instance.user_id))
@@ -1,69 +1,110 @@
 # backend/scheduler/tasks.py
 import logging
-import time
-import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
-from datetime import datetime
 
-from celery import shared_task
+from celery import group, shared_task
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from .models import Post, SocialAccount, PostMediaAsset
+from .models import Post, SocialAccount, PostMediaAsset, ValidationState
 from media.models import MediaAsset
-from .integrations.publisher import UniversalPublisher, PublicationError
+from .integrations.publisher import get_publisher, PublicationError
+from .integrations.facebook_service import FacebookService, FacebookGraphAPIError
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 5})
 def ping(self, payload: dict | None = None):
     """
-    Task de test: simule un petit traitement puis renvoie un message.
+    Task de test: renvoie immédiatement le message reçu.
+    Aucune attente: un ping ne doit jamais occuper un slot de worker.
     """
-    time.sleep(1)
     return {"ok": True, "echo": payload or {}}
 
+# Nombre maximum de posts publiés par passage de sweep_due_posts
+SWEEP_BATCH_SIZE = 500
+# Nombre maximum de lots lancés par passage de dispatch_due_posts
+DISPATCH_MAX_CHUNKS = 20
+
+def _claim_posts(queryset):
+    """
+    Réserve les posts du queryset pour publication: un seul UPDATE conditionnel
+    les passe en PUBLISHING avec un jeton propre à l'appelant
+    Exécuté hors transaction, il est validé avant tout appel HTTP; un worker
+    concurrent (ou une tâche relivrée) ne trouve plus rien à réserver.
+    Portable: ne dépend pas de SELECT ... FOR UPDATE SKIP LOCKED (SQLite)
+    
+    Returns:
+        Tuple (jeton, nombre de posts réservés)
+    """
+    token = uuid.uuid4().hex
+    claimed = queryset.update(
+        status=Post.PostStatus.PUBLISHING,
+        publication_claim=token,
+        updated_at=timezone.now()
+    )
+    return token, claimed
+
 @shared_task(bind=True, autoretry_for=(PublicationError,), retry_backoff=True, retry_kwargs={"max_retries": 3})
-def publish_post(self, post_id: int, force_publish: bool = False) -> Dict[str, Any]:
+def publish_post(self, post_id: int, force_publish: bool = False, claim_token: Optional[str] = None) -> Dict[str, Any]:
     """
     Enhanced post publishing task using the UniversalPublisher service.
+    The post is first claimed with one conditional UPDATE to PUBLISHING,
+    committed before any HTTP call, so concurrent workers and redelivered
+    tasks skip it instead of publishing it twice. claim_token is the claim
+    taken by the publish_now view; it can be taken over only once.
     """
+    now = timezone.now()
+    claimable = Post.objects.filter(pk=post_id)
+    if claim_token:
+        claimable = claimable.filter(status=Post.PostStatus.PUBLISHING, publication_claim=claim_token)
+    elif force_publish:
+        claimable = claimable.exclude(status__in=[Post.PostStatus.PUBLISHED, Post.PostStatus.PUBLISHING])
+    else:
+        claimable = claimable.filter(
+            Q(scheduled_time__isnull=True) | Q(scheduled_time__lte=now),
+            status=Post.PostStatus.SCHEDULED
+        )
+    
     try:
-        post = Post.objects.select_related('user', 'social_account').get(id=post_id)
-        
-        # Validate post is ready for publishing
-        if not force_publish and post.status != Post.PostStatus.SCHEDULED:
-            logger.warning(f"Post {post_id} is not scheduled for publishing (status: {post.status})")
-            return {"status": "skipped", "reason": "not_scheduled", "post_id": post_id}
-        
-        # Check if it's time to publish (with some tolerance)
-        if not force_publish and post.scheduled_at and post.scheduled_at > timezone.now():
-            logger.info(f"Post {post_id} not ready yet, scheduled for {post.scheduled_at}")
-            return {"status": "deferred", "scheduled_at": post.scheduled_at.isoformat(), "post_id": post_id}
-        
-        logger.info(f"Starting publication of post {post_id} to {post.social_account.platform}")
+        token, claimed = _claim_posts(claimable)
+    except Exception as e:
+        # Nothing was claimed nor sent: the task can safely run again
+        logger.error("Could not claim post %s: %s", post_id, e, exc_info=True)
+        raise self.retry(countdown=60 * (self.request.retries + 1))
+    
+    if not claimed:
+        current = Post.objects.filter(pk=post_id).values_list('status', 'scheduled_time').first()
+        if current is None:
+            logger.error("Post %s not found", post_id)
+            return {"status": "error", "error": "Post not found", "post_id": post_id}
         
-        # Use the UniversalPublisher service
-        publisher = UniversalPublisher()
-        result = publisher.publish_post(post, force=force_publish)
+        post_status, scheduled_time = current
+        if post_status == Post.PostStatus.SCHEDULED and not force_publish and scheduled_time and scheduled_time > now:
+            logger.info("Post %s not ready yet, scheduled for %s", post_id, scheduled_time)
+            return {"status": "deferred", "scheduled_at": scheduled_time.isoformat(), "post_id": post_id}
         
-        logger.info(f"Successfully published post {post_id}: {result['message']}")
-        return {
-            "status": "published",
-            "post_id": post_id,
-            "platform_post_id": result.get('platform_post_id'),
-            "published_url": result.get('published_url'),
-            "published_at": result.get('published_at'),
-            "message": result['message']
-        }
-                
-    except Post.DoesNotExist:
-        logger.error(f"Post {post_id} not found")
-        return {"status": "error", "error": "Post not found", "post_id": post_id}
+        logger.warning("Post %s is not scheduled or already being published", post_id)
+        return {"status": "skipped", "reason": "not_scheduled_or_claimed", "post_id": post_id}
     
+    try:
+        post = Post.publication_queryset().get(pk=post_id, publication_claim=token)
+        logger.debug("Starting publication of post %s to %s", post_id, post.target_platform)
+        
+        # The claim already checked the status: the publisher must not check it again
+        result = get_publisher().publish_post(post, force=True)
     except PublicationError as e:
-        logger.error(f"Publication error for post {post_id}: {str(e)}")
+        logger.error("Publication error for post %s: %s", post_id, e)
+        # Errors raised before any API call (validation, unsupported platform)
+        # leave the post claimed: release it as FAILED
+        Post.objects.filter(
+            pk=post_id, status=Post.PostStatus.PUBLISHING, publication_claim=token
+        ).update(status=Post.PostStatus.FAILED, error_message=str(e)[:1000], updated_at=timezone.now())
         return {
             "status": "failed",
             "post_id": post_id,
@@ -71,21 +112,103 @@ def publish_post(self, post_id: int, force_publish: bool = False) -> Dict[str, A
             "platform": e.platform,
             "error_code": e.error_code
         }
-    
     except Exception as e:
-        logger.error(f"Unexpected error publishing post {post_id}: {str(e)}\n{traceback.format_exc()}")
-        
-        # Update post status to failed if it exists
-        try:
-            post = Post.objects.get(id=post_id)
-            post.status = Post.PostStatus.FAILED
-            post.error_message = f"Unexpected error: {str(e)}"[:1000]
-            post.save(update_fields=['status', 'error_message', 'updated_at'])
-        except Post.DoesNotExist:
-            pass
-        
-        # Re-raise for Celery retry mechanism
-        raise self.retry(countdown=60 * (self.request.retries + 1))
+        # The post may already be live (e.g. the final write failed): it stays
+        # PUBLISHING and is never published again automatically
+        logger.error("Unexpected error publishing post %s, left in publishing: %s", post_id, e, exc_info=True)
+        raise
+    
+    logger.info("Successfully published post %s: %s", post_id, result['message'])
+    return {
+        "status": "published",
+        "post_id": post_id,
+        "platform_post_id": result.get('platform_post_id'),
+        "published_url": result.get('published_url'),
+        "published_at": result.get('published_at'),
+        "message": result['message']
+    }
+
+@shared_task(bind=True)
+def dispatch_due_posts(self, chunk_size: int = SWEEP_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Split the due posts into chunks and sweep them in parallel.
+    Runs periodically from Celery beat; the chunks are sent as one group,
+    so N due posts cost ceil(N / chunk_size) broker messages instead of N.
+    The due posts are claimed (moved to PUBLISHING) before the group is
+    sent, so the next tick cannot dispatch them a second time.
+    """
+    due_ids = list(
+        Post.due_for_publication(timezone.now())
+        .select_related(None).prefetch_related(None)
+        .order_by('scheduled_time')
+        .values_list('id', flat=True)[:chunk_size * DISPATCH_MAX_CHUNKS]
+    )
+    if not due_ids:
+        return {"due": 0, "chunks": 0}
+    
+    token, claimed = _claim_posts(Post.objects.filter(id__in=due_ids, status=Post.PostStatus.SCHEDULED))
+    if not claimed:
+        return {"due": 0, "chunks": 0}
+    claimed_ids = list(
+        Post.objects.filter(id__in=due_ids, publication_claim=token)
+        .order_by('scheduled_time').values_list('id', flat=True)
+    )
+    
+    chunks = [claimed_ids[i:i + chunk_size] for i in range(0, len(claimed_ids), chunk_size)]
+    try:
+        group(sweep_due_posts.s(post_ids=chunk, claim_token=token) for chunk in chunks).apply_async()
+    except Exception:
+        # Nothing was sent: give the posts back to the next tick
+        Post.objects.filter(
+            id__in=claimed_ids, status=Post.PostStatus.PUBLISHING, publication_claim=token
+        ).update(status=Post.PostStatus.SCHEDULED, publication_claim=None)
+        raise
+    
+    logger.info("Dispatched %d due posts in %d sweep tasks", len(claimed_ids), len(chunks))
+    return {"due": len(claimed_ids), "chunks": len(chunks)}
+
+@shared_task(bind=True)
+def sweep_due_posts(self, batch_size: int = SWEEP_BATCH_SIZE, post_ids: Optional[List[int]] = None,
+                    claim_token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Publish a batch of due posts.
+    Runs from dispatch_due_posts (one chunk of post_ids each) instead of one
+    ETA task per post. The batch is claimed with one UPDATE to PUBLISHING,
+    committed before any HTTP call; publication then runs outside any
+    transaction and the final statuses are written at the end. Overlapping
+    sweeps find nothing left to claim, and a batch interrupted after its
+    claim stays PUBLISHING instead of being published again.
+    claim_token is the dispatcher's claim on post_ids; it is taken over once,
+    so a redelivered sweep publishes nothing.
+    """
+    if claim_token:
+        due_ids = list(post_ids or ())[:batch_size]
+        claimable = Post.objects.filter(
+            id__in=due_ids, status=Post.PostStatus.PUBLISHING, publication_claim=claim_token
+        )
+    else:
+        due_posts = Post.due_for_publication(timezone.now()).select_related(None).prefetch_related(None)
+        if post_ids is not None:
+            due_posts = due_posts.filter(id__in=post_ids)
+        due_ids = list(due_posts.order_by('scheduled_time').values_list('id', flat=True)[:batch_size])
+        claimable = Post.objects.filter(id__in=due_ids, status=Post.PostStatus.SCHEDULED)
+    if not due_ids:
+        return {"processed": 0, "published": 0, "failed": 0}
+    
+    token, claimed = _claim_posts(claimable)
+    if not claimed:
+        return {"processed": 0, "published": 0, "failed": 0}
+    
+    posts = list(
+        Post.publication_queryset()
+        .filter(id__in=due_ids, publication_claim=token)
+        .order_by('scheduled_time')
+    )
+    results = get_publisher().publish_posts_bulk(posts)
+    
+    published = sum(1 for result in results.values() if result['success'])
+    logger.info("Sweep published %d/%d due posts", published, len(posts))
+    return {"processed": len(posts), "published": published, "failed": len(posts) - published}
 
 @shared_task(bind=True)
 def publish_post_now(self, post_id: int) -> Dict[str, Any]:
@@ -94,6 +217,22 @@ def publish_post_now(self, post_id: int) -> Dict[str, Any]:
     """
     return publish_post(post_id, force_publish=True)
 
+# Colonnes écrites par un test de connexion de compte social
+ACCOUNT_TEST_FIELDS = ['is_active', 'last_validated_at', 'error_message']
+# Taille des lots de comptes testés par test_social_accounts_bulk
+ACCOUNT_TEST_CHUNK_SIZE = 200
+
+def _apply_connection_test(social_account, result, now):
+    """Reporte le résultat d'un test de connexion sur le compte (en mémoire uniquement)"""
+    if result['success']:
+        social_account.is_active = True
+        social_account.last_validated_at = now
+        social_account.error_message = None
+    else:
+        # Compte marqué comme problématique
+        social_account.is_active = False
+        social_account.error_message = result['error'][:500]
+
 @shared_task(bind=True)
 def test_social_account_connection(self, social_account_id: int) -> Dict[str, Any]:
     """
@@ -101,17 +240,14 @@ def test_social_account_connection(self, social_account_id: int) -> Dict[str, An
     """
     try:
         social_account = SocialAccount.objects.get(id=social_account_id)
-        publisher = UniversalPublisher()
+        publisher = get_publisher()
         
         result = publisher.test_social_account_connection(social_account)
         
+        _apply_connection_test(social_account, result, timezone.now())
+        social_account.save(update_fields=ACCOUNT_TEST_FIELDS)
+        
         if result['success']:
-            # Update account status
-            social_account.is_active = True
-            social_account.last_validated_at = timezone.now()
-            social_account.error_message = None
-            social_account.save(update_fields=['is_active', 'last_validated_at', 'error_message'])
-            
             logger.info(f"Social account {social_account_id} validated successfully")
             return {
                 "status": "valid",
@@ -120,11 +256,6 @@ def test_social_account_connection(self, social_account_id: int) -> Dict[str, An
                 "user_info": result.get('user_info', {})
             }
         else:
-            # Mark account as problematic
-            social_account.is_active = False
-            social_account.error_message = result['error'][:500]
-            social_account.save(update_fields=['is_active', 'error_message'])
-            
             logger.error(f"Social account {social_account_id} validation failed: {result['error']}")
             return {
                 "status": "invalid",
@@ -137,15 +268,176 @@ def test_social_account_connection(self, social_account_id: int) -> Dict[str, An
         return {"status": "error", "error": "Social account not found"}
     
     except Exception as e:
-        logger.error(f"Error testing social account {social_account_id}: {str(e)}")
+        logger.error("Error testing social account %s: %s", social_account_id, e, exc_info=True)
         return {"status": "error", "error": str(e)}
 
+@shared_task(bind=True)
+def test_social_accounts_bulk(self, social_account_ids: List[int], max_workers: int = 16) -> Dict[str, Any]:
+    """
+    Test the connection of many social accounts at once.
+    One query loads the accounts, the Graph API checks run in a thread pool
+    and every result is written back with a single bulk_update.
+    """
+    accounts = list(SocialAccount.objects.filter(id__in=social_account_ids).defer('platform_config'))
+    if not accounts:
+        return {"tested": 0, "valid": 0, "invalid": 0}
+    
+    publisher = get_publisher()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(accounts))) as executor:
+        results = list(executor.map(publisher.test_social_account_connection, accounts))
+    
+    now = timezone.now()
+    for account, result in zip(accounts, results):
+        _apply_connection_test(account, result, now)
+    
+    with transaction.atomic():
+        SocialAccount.objects.bulk_update(accounts, ACCOUNT_TEST_FIELDS, batch_size=ACCOUNT_TEST_CHUNK_SIZE)
+    # bulk_update n'envoie aucun signal: les listes de comptes en cache sont invalidées ici
+    cache.delete_many({SocialAccount.accounts_list_cache_key(account.user_id) for account in accounts})
+    
+    valid = sum(1 for result in results if result['success'])
+    logger.info("Tested %d social accounts: %d valid", len(accounts), valid)
+    return {"tested": len(accounts), "valid": valid, "invalid": len(accounts) - valid}
+
+@shared_task(bind=True)
+def dispatch_social_account_tests(self, chunk_size: int = ACCOUNT_TEST_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Periodically re-test every active social account, in chunks.
+    Each chunk is one test_social_accounts_bulk task, all sent as one group.
+    """
+    account_ids = list(SocialAccount.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    chunks = [account_ids[i:i + chunk_size] for i in range(0, len(account_ids), chunk_size)]
+    if chunks:
+        group(test_social_accounts_bulk.s(chunk) for chunk in chunks).apply_async()
+    return {"accounts": len(account_ids), "chunks": len(chunks)}
+
+def _upsert_social_account(user_id: int, platform: str, platform_user_id: str,
+                           defaults: Dict[str, Any], now=None) -> bool:
+    """
+    Met à jour le compte existant par un UPDATE direct, sinon le crée
+    Évite le SELECT + SAVEPOINT de update_or_create sur le cas courant (reconnexion)
+    
+    Returns:
+        True si le compte a été créé
+    """
+    with transaction.atomic():
+        updated = SocialAccount.objects.filter(
+            user_id=user_id,
+            platform=platform,
+            platform_user_id=platform_user_id
+        ).update(updated_at=now or timezone.now(), **defaults)
+        if updated:
+            # UPDATE direct: aucun signal post_save, le cache est invalidé ici
+            cache.delete(SocialAccount.accounts_list_cache_key(user_id))
+            return False
+        
+        SocialAccount.objects.create(
+            user_id=user_id,
+            platform=platform,
+            platform_user_id=platform_user_id,
+            **defaults
+        )
+        return True
+
+@shared_task(bind=True)
+def provision_social_account(self, user_id: int, platform: str, code: str, redirect_uri: str) -> Dict[str, Any]:
+    """
+    Exchange an OAuth code and create or update the matching social account.
+    Runs outside the OAuth callback so the request returns immediately;
+    the frontend polls the provisioning status endpoint for the outcome.
+    """
+    facebook_service = get_publisher().facebook_service
+    
+    try:
+        # Échanger le code contre un token d'accès
+        token_data = facebook_service.exchange_code_for_token(code, redirect_uri)
+        
+        # Un seul appel me/accounts: pages et comptes Instagram liés (champs développés)
+        pages = facebook_service.get_user_pages(token_data['access_token'])
+        
+        # Une seule horloge pour l'expiration, la validation et la mise à jour du compte
+        now = timezone.now()
+        
+        if platform == 'facebook_page':
+            if pages:
+                # Prendre la première page ou permettre à l'utilisateur de choisir
+                page = pages[0]  # Pour simplifier, on prend la première
+                
+                # Créer ou mettre à jour le compte social
+                created = _upsert_social_account(
+                    user_id,
+                    'facebook_page',
+                    page['id'],
+                    {
+                        'username': page['name'],
+                        'access_token': page['access_token'],  # Token de la page
+                        'expires_at': now + timezone.timedelta(days=60),  # Long-lived token
+                        'is_active': True,
+                        'last_validated_at': now,
+                        'platform_config': {
+                            'page_name': page['name'],
+                            'page_category': page.get('category', ''),
+                            'permissions': page.get('perms', [])
+                        }
+                    },
+                    now=now
+                )
+                
+                action = 'créé' if created else 'mis à jour'
+                logger.info(f"Facebook page account {action} for user {user_id}: {page['name']}")
+            
+            else:
+                logger.warning(f"No Facebook pages found for user {user_id}")
+                return {"status": "error", "error": "no_pages", "platform": platform}
+        
+        elif platform in ['instagram_feed', 'instagram_story']:
+            # Pour Instagram, extraire les comptes Business des pages déjà récupérées
+            instagram_accounts = FacebookService.instagram_accounts_from_pages(pages)
+            
+            if instagram_accounts:
+                # Prendre le premier compte Instagram ou permettre de choisir
+                ig_account = instagram_accounts[0]
+                
+                # Créer ou mettre à jour le compte social
+                created = _upsert_social_account(
+                    user_id,
+                    platform,
+                    ig_account['id'],
+                    {
+                        'username': ig_account['username'],
+                        'access_token': token_data['access_token'],  # Token Facebook
+                        'expires_at': now + timezone.timedelta(days=60),
+                        'is_active': True,
+                        'last_validated_at': now,
+                        'platform_config': {
+                            'instagram_account_id': ig_account['id'],
+                            'username': ig_account['username'],
+                            'account_type': ig_account.get('account_type', 'BUSINESS')
+                        }
+                    },
+                    now=now
+                )
+                
+                action = 'créé' if created else 'mis à jour'
+                logger.info(f"Instagram account {action} for user {user_id}: {ig_account['username']}")
+            
+            else:
+                logger.warning(f"No Instagram Business accounts found for user {user_id}")
+                return {"status": "error", "error": "no_instagram", "platform": platform}
+        
+        return {"status": "connected", "platform": platform, "created": created}
+    
+    except FacebookGraphAPIError as e:
+        logger.error(f"Facebook API error provisioning {platform} for user {user_id}: {str(e)}")
+        return {"status": "error", "error": "api_error", "platform": platform}
+
 # Legacy function removed - now using UniversalPublisher service
 
 @shared_task(bind=True)
-def cleanup_failed_posts(self, days_old: int = 7) -> Dict[str, Any]:
+def cleanup_failed_posts(self, days_old: int = 7, reset: bool = False) -> Dict[str, Any]:
     """
     Clean up old failed posts and reset them for retry if needed.
+    With reset=True they go back to draft for manual review, in one UPDATE.
     """
     from datetime import timedelta
     from django.utils import timezone
@@ -157,23 +449,71 @@ def cleanup_failed_posts(self, days_old: int = 7) -> Dict[str, Any]:
         updated_at__lt=cutoff_date
     )
     
-    count = failed_posts.count()
-    logger.info(f"Found {count} failed posts older than {days_old} days")
+    # Nothing to clean on most runs: EXISTS stops at the first row, COUNT would scan them all
+    if not failed_posts.exists():
+        return {"processed": 0, "reset": reset, "cutoff_date": cutoff_date.isoformat()}
+    
+    if reset:
+        # Reset them to draft for manual review
+        count = failed_posts.update(status=Post.PostStatus.DRAFT, updated_at=timezone.now())
+        logger.info(f"Reset {count} failed posts older than {days_old} days to draft")
+    else:
+        count = failed_posts.count()
+        logger.info(f"Found {count} failed posts older than {days_old} days")
+    
+    return {"processed": count, "reset": reset, "cutoff_date": cutoff_date.isoformat()}
+
+# Taille des lots lus par validate_scheduled_posts
+VALIDATION_CHUNK_SIZE = 500
+# Nombre maximum de posts invalides détaillés dans le résultat de la tâche
+MAX_REPORTED_ERRORS = 100
+
+def _report_validation_errors(results, post_id, errors):
+    """Ajoute le détail d'un post invalide, dans la limite de MAX_REPORTED_ERRORS"""
+    if len(results["errors"]) < MAX_REPORTED_ERRORS:
+        results["errors"].append({"post_id": post_id, "errors": errors})
+    else:
+        results["errors_truncated"] = True
+
+@shared_task(bind=True)
+def dispatch_scheduled_validation(self, chunk_size: int = VALIDATION_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Split the scheduled posts into chunks and validate them in parallel.
+    The chunks are sent as one group, so validation spreads across workers
+    instead of running every post in a single task.
+    """
+    scheduled_ids = list(
+        Post.objects.filter(
+            status=Post.PostStatus.SCHEDULED,
+            is_active=True
+        ).order_by('id').values_list('id', flat=True)
+    )
+    if not scheduled_ids:
+        return {"scheduled": 0, "chunks": 0}
     
-    # Optionally reset them to draft for manual review
-    # failed_posts.update(status=Post.PostStatus.DRAFT)
+    chunks = [scheduled_ids[i:i + chunk_size] for i in range(0, len(scheduled_ids), chunk_size)]
+    result = group(validate_scheduled_posts.s(post_ids=chunk) for chunk in chunks).apply_async()
     
-    return {"processed": count, "cutoff_date": cutoff_date.isoformat()}
+    logger.info("Dispatched validation of %d scheduled posts in %d tasks", len(scheduled_ids), len(chunks))
+    return {"scheduled": len(scheduled_ids), "chunks": len(chunks), "group_id": result.id}
 
 @shared_task(bind=True)
-def validate_scheduled_posts(self) -> Dict[str, Any]:
+def validate_scheduled_posts(self, post_ids: Optional[List[int]] = None) -> Dict[str, Any]:
     """
-    Validate all scheduled posts to ensure they can be published when their time comes.
+    Validate scheduled posts to ensure they can be published when their time comes.
+    Without post_ids every scheduled post is checked; dispatch_scheduled_validation
+    passes one chunk of post_ids per task.
     """
     scheduled_posts = Post.objects.filter(
         status=Post.PostStatus.SCHEDULED,
         is_active=True
-    ).select_related('social_account').prefetch_related('media_assets')
+    )
+    if post_ids is not None:
+        scheduled_posts = scheduled_posts.filter(id__in=post_ids)
+    # Lecture par lots: mémoire bornée, un prefetch des médias par lot
+    scheduled_posts = scheduled_posts.select_related('social_account').prefetch_related('media_assets').iterator(
+        chunk_size=VALIDATION_CHUNK_SIZE
+    )
     
     results = {
         "total_checked": 0,
@@ -182,6 +522,9 @@ def validate_scheduled_posts(self) -> Dict[str, Any]:
         "errors": []
     }
     
+    # Posts dont validation_state a changé, écrits en un bulk_update final
+    dirty_posts = []
+    
     for post in scheduled_posts:
         results["total_checked"] += 1
         
@@ -189,20 +532,50 @@ def validate_scheduled_posts(self) -> Dict[str, Any]:
             validation_errors = post.validate_for_platform()
             if validation_errors:
                 results["invalid_posts"] += 1
-                results["errors"].append({
-                    "post_id": post.id,
-                    "errors": validation_errors
-                })
+                _report_validation_errors(results, post.id, validation_errors)
                 logger.warning(f"Post {post.id} has validation errors: {validation_errors}")
+                state = ValidationState.INVALID
             else:
                 results["valid_posts"] += 1
+                state = ValidationState.VALID
         except Exception as e:
             results["invalid_posts"] += 1
-            results["errors"].append({
-                "post_id": post.id,
-                "errors": [str(e)]
-            })
+            _report_validation_errors(results, post.id, [str(e)])
             logger.error(f"Error validating post {post.id}: {str(e)}")
+            state = ValidationState.UNKNOWN
+        
+        if post.validation_state != state:
+            post.validation_state = state
+            dirty_posts.append(post)
+    
+    if dirty_posts:
+        with transaction.atomic():
+            Post.objects.bulk_update(dirty_posts, ['validation_state'], batch_size=VALIDATION_CHUNK_SIZE)
+    results["updated_states"] = len(dirty_posts)
     
     logger.info(f"Validation complete: {results['valid_posts']}/{results['total_checked']} posts valid")
     return results
+
+@shared_task(bind=True)
+def refresh_upcoming_media_urls(self, hours_ahead: int = 1) -> Dict[str, Any]:
+    """
+    Recompute stored media URLs of posts due soon, so that signed storage
+    URLs (S3/GCS query-string auth) are still valid at publication time.
+    """
+    from datetime import timedelta
+    
+    now = timezone.now()
+    upcoming_posts = Post.objects.filter(
+        status=Post.PostStatus.SCHEDULED,
+        is_active=True,
+        scheduled_time__lte=now + timedelta(hours=hours_ahead)
+    ).exclude(cached_media_urls=[])
+    
+    refreshed = 0
+    for post in upcoming_posts:
+        post.refresh_cached_media_urls()
+        refreshed += 1
+    
+    logger.info(f"Refreshed media URLs of {refreshed} upcoming posts")
+    return {"refreshed": refreshed}
+
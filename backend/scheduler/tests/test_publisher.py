@@ -0,0 +1,187 @@
+from unittest import mock
+
+import orjson
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from scheduler.integrations.facebook_service import FacebookService
+from scheduler.integrations.publisher import UniversalPublisher
+from scheduler.models import Post, SocialAccount
+
+# Tests run without Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FlushStagedTests(TestCase):
+    """UniversalPublisher._flush_staged writes posts and account bookkeeping"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+        cls.other_account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-2',
+            username='other page', access_token='token-2'
+        )
+
+    def setUp(self):
+        self.publisher = UniversalPublisher()
+        self.now = timezone.now()
+        cache.clear()
+
+    def make_post(self, account=None):
+        return Post.objects.create(
+            user=self.user,
+            social_account=account or self.account,
+            content='Hello',
+            status=Post.PostStatus.SCHEDULED
+        )
+
+    def test_single_published_post_updates_account_usage(self):
+        post = self.make_post()
+        self.publisher._stage_result(post, {'platform_post_id': 'fb-1'}, self.now)
+
+        self.publisher._flush_staged([post], [], self.now)
+
+        post.refresh_from_db()
+        self.account.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.PUBLISHED)
+        self.assertEqual(post.platform_post_id, 'fb-1')
+        self.assertEqual(self.account.posts_count, 1)
+        self.assertEqual(self.account.last_used_at, self.now)
+
+    def test_several_published_posts_update_each_account_once(self):
+        posts = [self.make_post(), self.make_post(), self.make_post(self.other_account)]
+        for i, post in enumerate(posts):
+            self.publisher._stage_result(post, {'platform_post_id': f'fb-{i}'}, self.now)
+
+        self.publisher._flush_staged(posts, [], self.now)
+
+        self.account.refresh_from_db()
+        self.other_account.refresh_from_db()
+        self.assertEqual(self.account.posts_count, 2)
+        self.assertEqual(self.other_account.posts_count, 1)
+        self.assertEqual(
+            Post.objects.filter(status=Post.PostStatus.PUBLISHED).count(), 3
+        )
+
+    def test_flush_invalidates_cached_account_list_and_stats(self):
+        post = self.make_post()
+        list_key = SocialAccount.accounts_list_cache_key(self.user.id)
+        stats_key = Post.stats_cache_key(self.user.id)
+        cache.set_many({list_key: b'[]', stats_key: {}})
+        self.publisher._stage_result(post, {'platform_post_id': 'fb-1'}, self.now)
+
+        self.publisher._flush_staged([post], [], self.now)
+
+        self.assertIsNone(cache.get(list_key))
+        self.assertIsNone(cache.get(stats_key))
+
+    def test_failed_posts_leave_account_usage_untouched(self):
+        post = self.make_post()
+        self.publisher._stage_failure(post, 'Boom', self.now)
+
+        self.publisher._flush_staged([], [post], self.now)
+
+        post.refresh_from_db()
+        self.account.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.FAILED)
+        self.assertEqual(post.error_message, 'Boom')
+        self.assertEqual(self.account.posts_count, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PublishPostsBulkTests(TestCase):
+    """Facebook batch results are mapped back to every post of the batch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+
+    def setUp(self):
+        self.publisher = UniversalPublisher()
+        cache.clear()
+
+    def make_posts(self, count):
+        return list(Post.publication_queryset().filter(pk__in=[
+            Post.objects.create(
+                user=self.user, social_account=self.account,
+                content=f'Hello {i}', status=Post.PostStatus.SCHEDULED
+            ).pk
+            for i in range(count)
+        ]).order_by('pk'))
+
+    def test_posts_missing_from_batch_response_are_marked_failed(self):
+        posts = self.make_posts(3)
+        batch_results = [
+            {'success': True, 'platform_post_id': 'fb-0'},
+            {'success': True, 'platform_post_id': 'fb-1'},
+        ]
+        with mock.patch.object(self.publisher, 'validate_post_for_publication', return_value=[]), \
+                mock.patch.object(self.publisher.facebook_service, 'publish_facebook_posts_batch',
+                                  return_value=batch_results):
+            results = self.publisher.publish_posts_bulk(posts)
+
+        self.assertEqual(len(results), 3)
+        self.assertFalse(results[posts[2].pk]['success'])
+        statuses = dict(Post.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[posts[0].pk], Post.PostStatus.PUBLISHED)
+        self.assertEqual(statuses[posts[1].pk], Post.PostStatus.PUBLISHED)
+        self.assertEqual(statuses[posts[2].pk], Post.PostStatus.FAILED)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.posts_count, 2)
+
+
+def _batch_response(sub_responses):
+    """Fake Graph API batch response"""
+    return mock.Mock(status_code=200, content=orjson.dumps(sub_responses), text='')
+
+
+class FacebookBatchPublishTests(SimpleTestCase):
+    """publish_facebook_posts_batch keeps the results of requests that succeeded"""
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.service = FacebookService(session=self.session)
+        self.service.BATCH_MAX_REQUESTS = 2
+        self.items = [{'content': f'Hello {i}', 'media_urls': []} for i in range(4)]
+
+    def test_failed_request_only_fails_its_own_items(self):
+        self.session.post.side_effect = [
+            _batch_response([
+                {'code': 200, 'body': '{"id": "fb-0"}'},
+                {'code': 200, 'body': '{"id": "fb-1"}'},
+            ]),
+            requests.ConnectionError('connection reset'),
+        ]
+
+        results = self.service.publish_facebook_posts_batch('token', 'page-1', self.items)
+
+        self.assertEqual([result['success'] for result in results], [True, True, False, False])
+        self.assertEqual(results[0]['platform_post_id'], 'fb-0')
+        self.assertEqual(results[1]['platform_post_id'], 'fb-1')
+
+    def test_truncated_response_is_padded_with_failures(self):
+        self.session.post.side_effect = [
+            _batch_response([{'code': 200, 'body': '{"id": "fb-0"}'}]),
+            _batch_response([
+                {'code': 200, 'body': '{"id": "fb-2"}'},
+                {'code': 200, 'body': '{"id": "fb-3"}'},
+            ]),
+        ]
+
+        results = self.service.publish_facebook_posts_batch('token', 'page-1', self.items)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual([result['success'] for result in results], [True, False, True, True])
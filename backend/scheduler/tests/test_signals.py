@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from scheduler.models import Post, SocialAccount
+
+# Tests run without Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncPostPlatformTests(TestCase):
+    """Post.platform follows the platform of its social account"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.page = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+        cls.instagram = SocialAccount.objects.create(
+            user=cls.user, platform='instagram_feed', platform_user_id='ig-1',
+            username='insta', access_token='token'
+        )
+
+    def test_platform_set_on_creation(self):
+        post = Post.objects.create(user=self.user, social_account=self.page, content='Hello')
+
+        self.assertEqual(post.platform, 'facebook_page')
+
+    def test_platform_follows_account_reassigned_by_id(self):
+        post = Post.objects.create(user=self.user, social_account=self.page, content='Hello')
+        post = Post.objects.get(pk=post.pk)
+
+        post.social_account_id = self.instagram.pk
+        post.save()
+
+        post.refresh_from_db()
+        self.assertEqual(post.platform, 'instagram_feed')
+
+    def test_platform_follows_account_reassigned_by_instance(self):
+        post = Post.objects.create(user=self.user, social_account=self.page, content='Hello')
+
+        post.social_account = self.instagram
+        post.save()
+
+        post.refresh_from_db()
+        self.assertEqual(post.platform, 'instagram_feed')
+
+    def test_account_platform_change_is_propagated_to_posts(self):
+        post = Post.objects.create(user=self.user, social_account=self.page, content='Hello')
+        account = SocialAccount.objects.get(pk=self.page.pk)
+
+        account.platform = 'instagram_feed'
+        account.save()
+
+        post.refresh_from_db()
+        self.assertEqual(post.platform, 'instagram_feed')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheInvalidationSignalTests(TestCase):
+    """Saves and deletes drop the per-user caches they affect"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+
+    def setUp(self):
+        cache.clear()
+        self.account = SocialAccount.objects.create(
+            user=self.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+
+    def test_post_save_and_delete_drop_cached_stats(self):
+        key = Post.stats_cache_key(self.user.id)
+        cache.set(key, {'total': 0})
+        post = Post.objects.create(user=self.user, social_account=self.account, content='Hello')
+        self.assertIsNone(cache.get(key))
+
+        cache.set(key, {'total': 1})
+        post.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_account_save_and_delete_drop_cached_account_list(self):
+        key = SocialAccount.accounts_list_cache_key(self.user.id)
+        cache.set(key, b'{}')
+        self.account.username = 'renamed'
+        self.account.save()
+        self.assertIsNone(cache.get(key))
+
+        cache.set(key, b'{}')
+        self.account.delete()
+        self.assertIsNone(cache.get(key))
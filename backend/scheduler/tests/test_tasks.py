@@ -0,0 +1,251 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from scheduler.integrations.publisher import PublicationError, UniversalPublisher
+from scheduler.models import Post, SocialAccount
+from scheduler.tasks import dispatch_due_posts, publish_post, sweep_due_posts
+
+# Tests run without Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PublishPostTaskTests(TestCase):
+    """publish_post only publishes posts it could claim"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+
+    def setUp(self):
+        patcher = mock.patch('scheduler.tasks.get_publisher')
+        self.publisher = patcher.start().return_value
+        self.publisher.publish_post.return_value = {
+            'success': True, 'platform_post_id': 'fb-1', 'message': 'ok'
+        }
+        self.addCleanup(patcher.stop)
+
+    def make_post(self, status):
+        return Post.objects.create(
+            user=self.user, social_account=self.account, content='Hello', status=status
+        )
+
+    def test_due_scheduled_post_is_published(self):
+        post = self.make_post(Post.PostStatus.SCHEDULED)
+
+        result = publish_post.apply(args=[post.pk]).get()
+
+        self.assertEqual(result['status'], 'published')
+        self.publisher.publish_post.assert_called_once()
+        self.assertEqual(self.publisher.publish_post.call_args.args[0].pk, post.pk)
+
+    def test_post_no_longer_scheduled_is_skipped(self):
+        post = self.make_post(Post.PostStatus.PUBLISHED)
+
+        result = publish_post.apply(args=[post.pk]).get()
+
+        self.assertEqual(result['status'], 'skipped')
+        self.publisher.publish_post.assert_not_called()
+
+    def test_post_claimed_by_another_worker_is_skipped(self):
+        post = self.make_post(Post.PostStatus.SCHEDULED)
+
+        first = publish_post.apply(args=[post.pk]).get()
+        second = publish_post.apply(args=[post.pk]).get()
+
+        self.assertEqual(first['status'], 'published')
+        self.assertEqual(second['status'], 'skipped')
+        self.publisher.publish_post.assert_called_once()
+
+    def test_claim_from_publish_now_is_taken_over_once(self):
+        post = self.make_post(Post.PostStatus.PUBLISHING)
+        Post.objects.filter(pk=post.pk).update(publication_claim='view-claim')
+        kwargs = {'force_publish': True, 'claim_token': 'view-claim'}
+
+        first = publish_post.apply(args=[post.pk], kwargs=kwargs).get()
+        redelivered = publish_post.apply(args=[post.pk], kwargs=kwargs).get()
+
+        self.assertEqual(first['status'], 'published')
+        self.assertEqual(redelivered['status'], 'skipped')
+        self.publisher.publish_post.assert_called_once()
+
+    def test_future_post_is_deferred_and_left_scheduled(self):
+        post = self.make_post(Post.PostStatus.SCHEDULED)
+        Post.objects.filter(pk=post.pk).update(scheduled_time=timezone.now() + timedelta(hours=1))
+
+        result = publish_post.apply(args=[post.pk]).get()
+
+        self.assertEqual(result['status'], 'deferred')
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.SCHEDULED)
+
+    def test_publication_error_releases_the_claim_as_failed(self):
+        self.publisher.publish_post.side_effect = PublicationError('Plateforme non supportée')
+        post = self.make_post(Post.PostStatus.SCHEDULED)
+
+        result = publish_post.apply(args=[post.pk]).get()
+
+        self.assertEqual(result['status'], 'failed')
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.FAILED)
+
+    def test_unexpected_error_after_claim_leaves_post_publishing(self):
+        self.publisher.publish_post.side_effect = RuntimeError('final write failed')
+        post = self.make_post(Post.PostStatus.SCHEDULED)
+
+        result = publish_post.apply(args=[post.pk])
+
+        self.assertTrue(result.failed())
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.PUBLISHING)
+
+    def test_missing_post_reports_an_error(self):
+        result = publish_post.apply(args=[0]).get()
+
+        self.assertEqual(result['status'], 'error')
+        self.publisher.publish_post.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SweepDuePostsTests(TestCase):
+    """Due posts are claimed once, before any publication"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+
+    def setUp(self):
+        self.publisher = UniversalPublisher()
+        self.batch = mock.patch.object(
+            self.publisher.facebook_service, 'publish_facebook_posts_batch',
+            side_effect=lambda token, page_id, items: [
+                {'success': True, 'platform_post_id': f'fb-{i}'} for i in range(len(items))
+            ]
+        ).start()
+        mock.patch('scheduler.tasks.get_publisher', return_value=self.publisher).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def make_due_post(self):
+        return Post.objects.create(
+            user=self.user, social_account=self.account, content='Hello',
+            status=Post.PostStatus.SCHEDULED,
+            scheduled_time=timezone.now() - timedelta(minutes=1)
+        )
+
+    def test_due_posts_are_published(self):
+        posts = [self.make_due_post(), self.make_due_post()]
+
+        result = sweep_due_posts.apply().get()
+
+        self.assertEqual(result, {"processed": 2, "published": 2, "failed": 0})
+        self.batch.assert_called_once()
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(post.status, Post.PostStatus.PUBLISHED)
+
+    def test_post_claimed_by_another_sweep_is_not_picked_up(self):
+        post = self.make_due_post()
+        Post.objects.filter(pk=post.pk).update(
+            status=Post.PostStatus.PUBLISHING, publication_claim='other-sweep'
+        )
+
+        result = sweep_due_posts.apply().get()
+
+        self.assertEqual(result['processed'], 0)
+        self.batch.assert_not_called()
+
+    def test_overlapping_sweeps_publish_once(self):
+        post = self.make_due_post()
+
+        first = sweep_due_posts.apply(kwargs={'post_ids': [post.pk]}).get()
+        second = sweep_due_posts.apply(kwargs={'post_ids': [post.pk]}).get()
+
+        self.assertEqual(first['published'], 1)
+        self.assertEqual(second['processed'], 0)
+        self.batch.assert_called_once()
+
+    def test_dispatcher_claim_is_taken_over_once(self):
+        post = self.make_due_post()
+        Post.objects.filter(pk=post.pk).update(
+            status=Post.PostStatus.PUBLISHING, publication_claim='dispatch'
+        )
+        kwargs = {'post_ids': [post.pk], 'claim_token': 'dispatch'}
+
+        first = sweep_due_posts.apply(kwargs=kwargs).get()
+        redelivered = sweep_due_posts.apply(kwargs=kwargs).get()
+
+        self.assertEqual(first['published'], 1)
+        self.assertEqual(redelivered['processed'], 0)
+        self.batch.assert_called_once()
+
+    def test_flush_failure_does_not_leave_published_posts_scheduled(self):
+        post = self.make_due_post()
+
+        with mock.patch.object(self.publisher, '_flush_staged', side_effect=RuntimeError('database is locked')):
+            result = sweep_due_posts.apply()
+
+        self.assertTrue(result.failed())
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.PUBLISHING)
+
+        # The next tick does not publish the post a second time
+        self.assertEqual(sweep_due_posts.apply().get()['processed'], 0)
+        self.batch.assert_called_once()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DispatchDuePostsTests(TestCase):
+    """The dispatcher claims due posts before sending the sweep group"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+
+    def setUp(self):
+        self.group = mock.patch('scheduler.tasks.group').start()
+        self.addCleanup(mock.patch.stopall)
+        self.posts = [
+            Post.objects.create(
+                user=self.user, social_account=self.account, content='Hello',
+                status=Post.PostStatus.SCHEDULED,
+                scheduled_time=timezone.now() - timedelta(minutes=1)
+            )
+            for _ in range(3)
+        ]
+
+    def test_due_posts_are_claimed_and_dispatched_once(self):
+        first = dispatch_due_posts.apply(kwargs={'chunk_size': 2}).get()
+        second = dispatch_due_posts.apply(kwargs={'chunk_size': 2}).get()
+
+        self.assertEqual(first, {"due": 3, "chunks": 2})
+        self.assertEqual(second, {"due": 0, "chunks": 0})
+        self.group.assert_called_once()
+        self.assertEqual(
+            Post.objects.filter(status=Post.PostStatus.PUBLISHING).count(), 3
+        )
+
+    def test_claim_is_released_when_the_group_cannot_be_sent(self):
+        self.group.return_value.apply_async.side_effect = ConnectionError('broker down')
+
+        result = dispatch_due_posts.apply()
+
+        self.assertTrue(result.failed())
+        self.assertEqual(
+            Post.objects.filter(status=Post.PostStatus.SCHEDULED).count(), 3
+        )
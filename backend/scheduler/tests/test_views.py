@@ -0,0 +1,212 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from scheduler.models import Post, SocialAccount
+
+# Tests run without Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ViewTestCase(TestCase):
+    """Authenticated API client and one social account per test"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+        cls.account = SocialAccount.objects.create(
+            user=cls.user, platform='facebook_page', platform_user_id='page-1',
+            username='page', access_token='token'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_post(self, status=Post.PostStatus.SCHEDULED):
+        return Post.objects.create(
+            user=self.user, social_account=self.account, content='Hello', status=status
+        )
+
+
+class CancelScheduleTests(ViewTestCase):
+
+    def url(self, pk):
+        return f'/api/scheduler/posts/{pk}/cancel_schedule/'
+
+    def test_scheduled_post_is_cancelled(self):
+        post = self.make_post()
+
+        response = self.client.post(self.url(post.pk))
+
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.CANCELLED)
+        self.assertEqual(response.data['post']['id'], post.pk)
+        self.assertEqual(response.data['post']['status'], Post.PostStatus.CANCELLED)
+        self.assertNotIn('content', response.data['post'])
+
+    def test_full_payload_on_request(self):
+        post = self.make_post()
+
+        response = self.client.post(self.url(post.pk) + '?full=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['post']['id'], post.pk)
+        self.assertEqual(response.data['post']['content'], 'Hello')
+
+    def test_draft_post_is_rejected(self):
+        post = self.make_post(Post.PostStatus.DRAFT)
+
+        response = self.client.post(self.url(post.pk))
+
+        self.assertEqual(response.status_code, 400)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.DRAFT)
+
+    def test_other_users_post_is_not_found(self):
+        other = get_user_model().objects.create_user(email='other@example.com', password='secret123')
+        post = self.make_post()
+        self.client.force_authenticate(other)
+
+        response = self.client.post(self.url(post.pk))
+
+        self.assertEqual(response.status_code, 404)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.SCHEDULED)
+
+    def test_non_numeric_pk_is_not_found(self):
+        response = self.client.post(self.url('abc'))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ToggleActiveTests(ViewTestCase):
+
+    def url(self, pk):
+        return f'/api/scheduler/social-accounts/{pk}/toggle_active/'
+
+    def test_account_is_flipped_both_ways(self):
+        response = self.client.post(self.url(self.account.pk))
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        self.assertFalse(self.account.is_active)
+        self.assertEqual(response.data['account'], {'id': self.account.pk, 'is_active': False})
+
+        response = self.client.post(self.url(self.account.pk))
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        self.assertTrue(self.account.is_active)
+
+    def test_non_numeric_pk_is_not_found(self):
+        response = self.client.post(self.url('abc'))
+
+        self.assertEqual(response.status_code, 404)
+
+
+@mock.patch('scheduler.views.publish_post')
+class PublishNowTests(ViewTestCase):
+
+    def url(self, pk):
+        return f'/api/scheduler/posts/{pk}/publish_now/'
+
+    def test_post_is_claimed_and_queued_once(self, publish_post):
+        publish_post.delay.return_value = mock.Mock(id='task-1')
+        post = self.make_post(Post.PostStatus.DRAFT)
+
+        first = self.client.post(self.url(post.pk))
+        second = self.client.post(self.url(post.pk))
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['task_id'], 'task-1')
+        self.assertEqual(second.status_code, 400)
+        publish_post.delay.assert_called_once_with(post.pk, force_publish=True, claim_token=mock.ANY)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.PUBLISHING)
+
+    def test_claim_lost_to_a_concurrent_request_is_rejected(self, publish_post):
+        post = self.make_post(Post.PostStatus.DRAFT)
+        original_update = Post.objects.filter(pk=post.pk).update
+        # Another request moves the post to PUBLISHING between the read and the claim
+        with mock.patch.object(
+            Post, 'validate_for_platform',
+            autospec=True,
+            side_effect=lambda instance: original_update(status=Post.PostStatus.PUBLISHING) and []
+        ):
+            response = self.client.post(self.url(post.pk))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'This post is currently being published')
+        publish_post.delay.assert_not_called()
+
+    def test_claim_is_released_when_queuing_fails(self, publish_post):
+        publish_post.delay.side_effect = ConnectionError('broker down')
+        post = self.make_post(Post.PostStatus.SCHEDULED)
+        self.client.raise_request_exception = False
+
+        response = self.client.post(self.url(post.pk))
+
+        self.assertEqual(response.status_code, 500)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostStatus.SCHEDULED)
+
+    def test_published_post_is_rejected(self, publish_post):
+        post = self.make_post(Post.PostStatus.PUBLISHED)
+
+        response = self.client.post(self.url(post.pk))
+
+        self.assertEqual(response.status_code, 400)
+        publish_post.delay.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@mock.patch('scheduler.tasks.provision_social_account')
+@mock.patch('scheduler.oauth_views._FB_SERVICE')
+class FacebookAuthCallbackTests(TestCase):
+    """The OAuth state is only accepted by the session that started the flow"""
+
+    start_url = '/api/scheduler/auth/facebook/start/'
+    callback_url = '/api/scheduler/auth/facebook/callback/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='secret123')
+
+    def start_flow(self, client, fb_service):
+        fb_service.get_auth_url.return_value = 'https://facebook.example/auth'
+        client.get(self.start_url, {'platform': 'facebook_page'})
+        return fb_service.get_auth_url.call_args.kwargs['state']
+
+    def test_callback_from_starting_session_provisions_account(self, fb_service, provision):
+        provision.delay.return_value.id = 'task-1'
+        self.client.force_login(self.user)
+        state = self.start_flow(self.client, fb_service)
+
+        response = self.client.get(self.callback_url, {'code': 'abc', 'state': state})
+
+        self.assertEqual(response.status_code, 302)
+        provision.delay.assert_called_once_with(self.user.id, 'facebook_page', 'abc', mock.ANY)
+
+    def test_state_replayed_in_another_session_is_rejected(self, fb_service, provision):
+        self.client.force_login(self.user)
+        state = self.start_flow(self.client, fb_service)
+
+        victim = Client()
+        response = victim.get(self.callback_url, {'code': 'abc', 'state': state})
+
+        self.assertEqual(response.status_code, 400)
+        provision.delay.assert_not_called()
+
+    def test_state_is_single_use(self, fb_service, provision):
+        provision.delay.return_value.id = 'task-1'
+        self.client.force_login(self.user)
+        state = self.start_flow(self.client, fb_service)
+        self.client.get(self.callback_url, {'code': 'abc', 'state': state})
+
+        response = self.client.get(self.callback_url, {'code': 'abc', 'state': state})
+
+        self.assertEqual(response.status_code, 400)
+        provision.delay.assert_called_once()
@@ -8,16 +8,19 @@ router = DefaultRouter()
 router.register(r'posts', views.PostViewSet, basename='posts')
 router.register(r'social-accounts', views.SocialAccountViewSet, basename='social-accounts')
 
-urlpatterns = [
-    # API endpoints
-    path('', include(router.urls)),
-    
+# Explicit routes come before the router: 'social-accounts/<pk>/' would
+# otherwise capture 'social-accounts/list/' as a detail lookup
+urlpatterns = (
     # OAuth endpoints for Facebook/Instagram
     path('auth/facebook/start/', oauth_views.facebook_auth_start, name='facebook_auth_start'),
     path('auth/facebook/callback/', oauth_views.facebook_auth_callback, name='facebook_auth_callback'),
-    
+    path('auth/facebook/provisioning/<str:token>/', oauth_views.social_account_provisioning_status, name='social_account_provisioning_status'),
+
     # Social account management
     path('social-accounts/list/', oauth_views.social_accounts_list, name='social_accounts_list'),
     path('social-accounts/<int:account_id>/test/', oauth_views.test_social_account, name='test_social_account'),
     path('social-accounts/<int:account_id>/disconnect/', oauth_views.disconnect_social_account, name='disconnect_social_account'),
-]
\ No newline at end of file
+
+    # API endpoints
+    path('', include(router.urls)),
+)
@@ -1,9 +1,15 @@
+import uuid
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Case, Count, Prefetch, Q, Sum, Value, When
+from django.http import Http404
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.pagination import LimitOffsetPagination
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Post, SocialAccount, PostMediaAsset
@@ -11,7 +17,60 @@ from .serializers import (
     PostSerializer, PostCreateSerializer, PostUpdateSerializer,
     SocialAccountSerializer, PostValidationSerializer
 )
-from .tasks import publish_post, validate_scheduled_posts
+from .tasks import publish_post, dispatch_scheduled_validation
+
+# Keys of PostViewSet.stats()['by_status'] and the status each one counts
+STATS_STATUS_KEYS = {
+    'drafts': Post.PostStatus.DRAFT,
+    'scheduled': Post.PostStatus.SCHEDULED,
+    'published': Post.PostStatus.PUBLISHED,
+    'failed': Post.PostStatus.FAILED,
+    'publishing': Post.PostStatus.PUBLISHING,
+    'cancelled': Post.PostStatus.CANCELLED,
+}
+
+# Seconds a user's PostViewSet.stats() response stays cached (dropped on every Post save/delete)
+STATS_CACHE_TTL = 30
+
+# Statuses publish_now refuses, with the error returned for each
+PUBLISH_NOW_BLOCKED = {
+    Post.PostStatus.PUBLISHED: 'This post is already published',
+    Post.PostStatus.PUBLISHING: 'This post is currently being published',
+}
+
+# (value, label) pairs of every platform, in declaration order
+PLATFORM_CHOICES = tuple(SocialAccount.SocialPlatform.choices)
+
+# Platforms reported in PostViewSet.stats()['by_platform']
+POST_PLATFORMS = tuple(value for value, _ in PLATFORM_CHOICES)
+
+# Columns read by SocialAccountSerializer (tokens and platform_user_id are never sent)
+SOCIAL_ACCOUNT_SERIALIZER_FIELDS = (
+    'id', 'user_id', 'platform', 'username', 'is_active', 'platform_config',
+    'posts_count', 'last_used_at', 'created_at', 'updated_at',
+)
+
+# Columns PostSerializer never reads, skipped on list responses: internal JSON
+# bookkeeping on the post, and the account tokens pulled in by select_related
+POST_LIST_DEFERRED_FIELDS = (
+    'platforms', 'cached_media_urls', 'celery_task_id',
+    'social_account__access_token', 'social_account__refresh_token',
+)
+
+def wants_full_payload(request):
+    """Whether a state-change action should answer with the fully serialized object (?full=1)"""
+    return request.query_params.get('full', '').lower() in ('1', 'true')
+
+def with_serializer_relations(queryset):
+    """Load everything PostSerializer reads, in a fixed number of queries"""
+    return queryset.select_related('social_account', 'user').prefetch_related(
+        Prefetch(
+            'post_media_assets',
+            queryset=PostMediaAsset.objects.select_related('asset').order_by('order'),
+            to_attr='ordered_media'
+        ),
+        'media_assets'
+    )
 
 class PostViewSet(viewsets.ModelViewSet):
     """Enhanced ViewSet for managing posts with media assets and platform validation"""
@@ -20,7 +79,12 @@ class PostViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'scheduled_time', 'published_at', 'updated_at']
     ordering = ['-created_at']
     search_fields = ['title', 'content']
+    # Per-status lists go through list(): GET /posts/?status=draft (or scheduled, published, failed)
     filterset_fields = ['status', 'social_account__platform', 'is_active']
+    # Opt-in pagination: responses stay plain lists unless ?limit= is given
+    pagination_class = LimitOffsetPagination
+    # Numeric pks only: actions filtering on pk directly never see a non-integer value
+    lookup_value_regex = r'\d+'
     
     def get_queryset(self):
         """Return only posts for the authenticated user"""
@@ -28,9 +92,21 @@ class PostViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return Post.objects.none()
         
-        return Post.objects.filter(user=self.request.user).select_related(
-            'social_account', 'user'
-        ).prefetch_related('postmediaasset_set__asset')
+        # Built once per request: DRF calls get_queryset() from several places
+        # (get_object, filter_queryset, extra actions) and only ever clones it
+        if getattr(self, '_base_queryset', None) is None:
+            queryset = with_serializer_relations(Post.objects.filter(user=self.request.user))
+            # Only list responses skip columns: detail actions save or copy the instance
+            if not getattr(self, 'detail', True):
+                queryset = queryset.defer(*POST_LIST_DEFERRED_FIELDS)
+            self._base_queryset = queryset
+        return self._base_queryset
+    
+    def get_serializer_context(self):
+        """Only run platform validation on single-post responses, not on lists"""
+        context = super().get_serializer_context()
+        context['include_validation'] = getattr(self, 'detail', True)
+        return context
     
     def get_serializer_class(self):
         """Choose appropriate serializer based on action"""
@@ -42,48 +118,14 @@ class PostViewSet(viewsets.ModelViewSet):
             return PostValidationSerializer
         return PostSerializer
     
-    @action(detail=False, methods=['get'])
-    def drafts(self, request):
-        """Get all draft posts"""
-        drafts = self.get_queryset().filter(status=Post.PostStatus.DRAFT)
-        serializer = self.get_serializer(drafts, many=True)
-        return Response(serializer.data)
-    
-    @action(detail=False, methods=['get'])
-    def scheduled(self, request):
-        """Get all scheduled posts"""
-        scheduled = self.get_queryset().filter(status=Post.PostStatus.SCHEDULED)
-        serializer = self.get_serializer(scheduled, many=True)
-        return Response(serializer.data)
-    
-    @action(detail=False, methods=['get'])
-    def published(self, request):
-        """Get all published posts"""
-        published = self.get_queryset().filter(status=Post.PostStatus.PUBLISHED)
-        serializer = self.get_serializer(published, many=True)
-        return Response(serializer.data)
-    
-    @action(detail=False, methods=['get'])
-    def failed(self, request):
-        """Get all failed posts"""
-        failed = self.get_queryset().filter(status=Post.PostStatus.FAILED)
-        serializer = self.get_serializer(failed, many=True)
-        return Response(serializer.data)
-    
     @action(detail=True, methods=['post'])
     def publish_now(self, request, pk=None):
         """Publish a post immediately using Celery"""
         post = self.get_object()
         
-        if post.status == Post.PostStatus.PUBLISHED:
-            return Response(
-                {'error': 'This post is already published'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if post.status == Post.PostStatus.PUBLISHING:
+        if post.status in PUBLISH_NOW_BLOCKED:
             return Response(
-                {'error': 'This post is currently being published'},
+                {'error': PUBLISH_NOW_BLOCKED[post.status]},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -98,8 +140,32 @@ class PostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Claim the post with a compare-and-swap on the status read above:
+        # of two concurrent requests, only one moves it to PUBLISHING and enqueues it
+        # The claim token is handed to publish_post, which takes the claim over once
+        claim_token = uuid.uuid4().hex
+        claimed = Post.objects.filter(pk=post.pk, status=post.status).update(
+            status=Post.PostStatus.PUBLISHING,
+            publication_claim=claim_token,
+            updated_at=timezone.now()
+        )
+        if not claimed:
+            current_status = Post.objects.filter(pk=post.pk).values_list('status', flat=True).first()
+            return Response(
+                {'error': PUBLISH_NOW_BLOCKED.get(current_status, 'This post was modified meanwhile, please retry')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        cache.delete(Post.stats_cache_key(request.user.id))
+        
         # Queue for immediate publication
-        task = publish_post.delay(post.id, force_publish=True)
+        try:
+            task = publish_post.delay(post.id, force_publish=True, claim_token=claim_token)
+        except Exception:
+            # Nothing was queued: release the claim so the post is not stuck in PUBLISHING
+            Post.objects.filter(
+                pk=post.pk, status=Post.PostStatus.PUBLISHING, publication_claim=claim_token
+            ).update(status=post.status, publication_claim=None)
+            raise
         
         return Response({
             'message': 'Post queued for immediate publication',
@@ -110,22 +176,32 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cancel_schedule(self, request, pk=None):
         """Cancel post scheduling"""
-        post = self.get_object()
+        # Status check and write in one conditional UPDATE (no instance, no signals)
+        updated = Post.objects.filter(
+            pk=pk,
+            user=request.user,
+            status__in=[Post.PostStatus.SCHEDULED, Post.PostStatus.PUBLISHING]
+        ).update(status=Post.PostStatus.CANCELLED, updated_at=timezone.now())
         
-        if post.status not in [Post.PostStatus.SCHEDULED, Post.PostStatus.PUBLISHING]:
+        if not updated:
+            # Only the failure path pays for telling "missing" from "wrong status"
+            if not Post.objects.filter(pk=pk, user=request.user).exists():
+                raise Http404
             return Response(
                 {'error': 'This post is not scheduled or being published'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update post status
-        post.status = Post.PostStatus.CANCELLED
-        post.save(update_fields=['status', 'updated_at'])
+        # Direct UPDATE sends no post_save signal: drop the cached stats here
+        cache.delete(Post.stats_cache_key(request.user.id))
         
-        serializer = self.get_serializer(post)
+        if wants_full_payload(request):
+            post_data = self.get_serializer(self.get_queryset().get(pk=pk)).data
+        else:
+            post_data = Post.objects.filter(pk=pk).values('id', 'status', 'updated_at').get()
         return Response({
             'message': 'Post scheduling cancelled',
-            'post': serializer.data
+            'post': post_data
         })
     
     @action(detail=True, methods=['post'])
@@ -133,26 +209,33 @@ class PostViewSet(viewsets.ModelViewSet):
         """Duplicate an existing post"""
         original_post = self.get_object()
         
-        # Create a copy of the post
-        new_post = Post.objects.create(
-            user=original_post.user,
-            title=f"Copy of {original_post.title}" if original_post.title else None,
-            content=original_post.content,
-            social_account=original_post.social_account,
-            platform_configs=original_post.platform_configs.copy(),
-            status=Post.PostStatus.DRAFT,
-            image=original_post.image,
-            video=original_post.video
-        )
-        
-        # Copy media assets
-        for post_asset in original_post.postmediaasset_set.all():
-            PostMediaAsset.objects.create(
-                post=new_post,
-                asset=post_asset.asset,
-                order=post_asset.order,
-                metadata=post_asset.metadata.copy() if post_asset.metadata else {}
+        with transaction.atomic():
+            # Create a copy of the post
+            new_post = Post.objects.create(
+                user=original_post.user,
+                title=f"Copy of {original_post.title}" if original_post.title else None,
+                content=original_post.content,
+                social_account=original_post.social_account,
+                platform_configs=original_post.platform_configs,
+                status=Post.PostStatus.DRAFT,
+                image=original_post.image,
+                video=original_post.video
             )
+            
+            # Copy media assets in one INSERT, from the list prefetched by get_queryset().
+            # JSON configs are shared, not copied: they are serialized on INSERT and
+            # neither instance is mutated afterwards
+            PostMediaAsset.objects.bulk_create([
+                PostMediaAsset(
+                    post=new_post,
+                    asset_id=post_asset.asset_id,
+                    order=post_asset.order,
+                    platform_configs=post_asset.platform_configs or {}
+                )
+                for post_asset in original_post.ordered_media
+            ])
+            # bulk_create sends no per-row signal: refresh the media-derived fields once
+            new_post.refresh_media_state()
         
         serializer = self.get_serializer(new_post)
         return Response({
@@ -166,8 +249,7 @@ class PostViewSet(viewsets.ModelViewSet):
         post = self.get_object()
         
         try:
-            validation_errors = post.validate_for_platform()
-            platform_rules = post.get_platform_rules()
+            validation_errors, platform_rules = post.validate_and_rules()
             
             return Response({
                 'is_valid': len(validation_errors) == 0,
@@ -190,35 +272,44 @@ class PostViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get user post statistics"""
-        queryset = self.get_queryset()
+        """Get user post statistics, cached per user for STATS_CACHE_TTL seconds"""
+        stats = cache.get_or_set(
+            Post.stats_cache_key(request.user.id),
+            lambda: self._build_stats(request.user),
+            STATS_CACHE_TTL
+        )
+        return Response(stats)
+    
+    def _build_stats(self, user):
+        """User post statistics (one aggregate query plus one GROUP BY)"""
+        queryset = Post.objects.filter(user=user)
+        
+        counts = queryset.aggregate(
+            total=Count('id'),
+            **{
+                key: Count('id', filter=Q(status=value))
+                for key, value in STATS_STATUS_KEYS.items()
+            }
+        )
         
         stats = {
-            'total': queryset.count(),
-            'by_status': {
-                'drafts': queryset.filter(status=Post.PostStatus.DRAFT).count(),
-                'scheduled': queryset.filter(status=Post.PostStatus.SCHEDULED).count(),
-                'published': queryset.filter(status=Post.PostStatus.PUBLISHED).count(),
-                'failed': queryset.filter(status=Post.PostStatus.FAILED).count(),
-                'publishing': queryset.filter(status=Post.PostStatus.PUBLISHING).count(),
-                'cancelled': queryset.filter(status=Post.PostStatus.CANCELLED).count(),
-            },
+            'total': counts['total'],
+            'by_status': {key: counts[key] for key in STATS_STATUS_KEYS},
             'by_platform': {}
         }
         
-        # Platform breakdown
-        for platform_choice in Post.SocialPlatform.choices:
-            platform = platform_choice[0]
-            count = queryset.filter(social_account__platform=platform).count()
-            if count > 0:
-                stats['by_platform'][platform] = count
+        # Platform breakdown; order_by() drops the default ordering from the GROUP BY
+        platform_counts = queryset.filter(
+            platform__in=POST_PLATFORMS
+        ).order_by().values_list('platform').annotate(count=Count('id'))
+        stats['by_platform'] = dict(platform_counts)
         
-        return Response(stats)
+        return stats
     
     @action(detail=False, methods=['post'])
     def validate_all_scheduled(self, request):
-        """Trigger validation of all scheduled posts"""
-        task = validate_scheduled_posts.delay()
+        """Trigger validation of all scheduled posts, split into parallel chunks"""
+        task = dispatch_scheduled_validation.delay()
         
         return Response({
             'message': 'Validation task queued for all scheduled posts',
@@ -233,6 +324,8 @@ class SocialAccountViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'last_used_at', 'posts_count']
     ordering = ['-created_at']
     search_fields = ['username']
+    # Numeric pks only: actions filtering on pk directly never see a non-integer value
+    lookup_value_regex = r'\d+'
     
     def get_queryset(self):
         """Return only accounts for the authenticated user"""
@@ -241,14 +334,25 @@ class SocialAccountViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
         """Toggle account active status"""
-        account = self.get_object()
-        account.is_active = not account.is_active
-        account.save(update_fields=['is_active'])
+        # Flipped in SQL: one UPDATE, no instance loaded beforehand
+        updated = self.get_queryset().filter(pk=pk).update(
+            is_active=Case(When(is_active=True, then=Value(False)), default=Value(True))
+        )
+        if not updated:
+            raise Http404
+        # Direct UPDATE sends no post_save signal: drop the cached account list here
+        cache.delete(SocialAccount.accounts_list_cache_key(request.user.id))
         
-        serializer = self.get_serializer(account)
+        if wants_full_payload(request):
+            account = self.get_queryset().only(*SOCIAL_ACCOUNT_SERIALIZER_FIELDS).get(pk=pk)
+            is_active = account.is_active
+            account_data = self.get_serializer(account).data
+        else:
+            account_data = self.get_queryset().filter(pk=pk).values('id', 'is_active').get()
+            is_active = account_data['is_active']
         return Response({
-            'message': f'Account {"activated" if account.is_active else "deactivated"}',
-            'account': serializer.data
+            'message': f'Account {"activated" if is_active else "deactivated"}',
+            'account': account_data
         })
     
     @action(detail=True, methods=['get'])
@@ -266,37 +370,41 @@ class SocialAccountViewSet(viewsets.ModelViewSet):
     def posts(self, request, pk=None):
         """Get all posts for this social account"""
         account = self.get_object()
-        posts = Post.objects.filter(
+        posts = list(with_serializer_relations(Post.objects.filter(
             user=request.user,
             social_account=account
-        ).order_by('-created_at')
+        )).order_by('-created_at'))
         
         # Use the PostSerializer for consistency
-        from .serializers import PostSerializer
-        serializer = PostSerializer(posts, many=True, context={'request': request})
+        serializer = PostSerializer(posts, many=True, context={'request': request, 'include_validation': False})
         
         return Response({
             'account': self.get_serializer(account).data,
             'posts': serializer.data,
-            'total_posts': posts.count()
+            'total_posts': len(posts)
         })
     
     @action(detail=False, methods=['get'])
     def platform_stats(self, request):
-        """Get statistics by platform"""
-        queryset = self.get_queryset()
+        """Get statistics by platform (one GROUP BY query)"""
+        rows = {
+            row['platform']: row
+            for row in self.get_queryset().order_by().values('platform').annotate(
+                total_accounts=Count('id'),
+                active_accounts=Count('id', filter=Q(is_active=True)),
+                total_posts=Sum('posts_count')
+            )
+        }
         
         stats = {}
-        for platform_choice in SocialAccount.SocialPlatform.choices:
-            platform = platform_choice[0]
-            platform_accounts = queryset.filter(platform=platform)
-            
-            if platform_accounts.exists():
+        for platform, display_name in PLATFORM_CHOICES:
+            row = rows.get(platform)
+            if row:
                 stats[platform] = {
-                    'total_accounts': platform_accounts.count(),
-                    'active_accounts': platform_accounts.filter(is_active=True).count(),
-                    'total_posts': sum(acc.posts_count for acc in platform_accounts),
-                    'display_name': platform_choice[1]
+                    'total_accounts': row['total_accounts'],
+                    'active_accounts': row['active_accounts'],
+                    'total_posts': row['total_posts'] or 0,
+                    'display_name': display_name
                 }
         
         return Response(stats)
@@ -14,8 +14,5 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ("email","password","full_name")
 
     def create(self, validated_data):
-        password = validated_data.pop("password")
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # create_user hashes the password and saves in a single INSERT
+        return User.objects.create_user(**validated_data)
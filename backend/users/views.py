@@ -14,7 +14,14 @@ class MeViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=["get"])
     def profile(self, request):
-        return Response(UserSerializer(request.user).data)
+        # Lecture seule à schéma fixe : même sortie que UserSerializer, sans l'instancier
+        user = request.user
+        return Response({
+            "id": user.id,
+            "email": user.email,
+            "full_name": user.full_name,
+            "avatar": user.avatar.url if user.avatar else None,
+        })
 
     @action(detail=False, methods=["patch"])
     def update_profile(self, request):